@@ -0,0 +1,115 @@
+# File: AsyncCANSystem.py
+# This file is part of the OBU project.
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the MIT License
+
+#----------------------------------------------------------------------------
+# asyncio front end of the CAN system.
+# The Notifier is attached to the running event loop : with socketcan the
+# socket is watched by the loop itself (no RX thread), frames are read with
+# `async for` and handlers are coroutines awaited in arrival order. Control
+# loops, MQTT ingestion and CAN I/O can then share a single event loop.
+#
+#     async def main():
+#         async with AsyncCANSystem("OBU") as can_sys:
+#             can_sys.subscribe("accel_pedal", on_accel)
+#             await can_sys.send("STEER", "start", 0)
+#             await can_sys.run()
+#----------------------------------------------------------------------------
+
+import asyncio
+
+import can
+
+from .CANSystem import CANManager
+
+# Delay between two attempts when the socket TX buffer is full
+SEND_RETRY_DELAY = 0.001
+
+
+class AsyncCANSystem:
+    def __init__(self, device_name, channel='can0', interface='socketcan', verbose=False, use_filters=True):
+        self.device_name = device_name
+        self.verbose = verbose
+        self.can_manager = CANManager(bus=None, device_name=self.device_name)
+        self.can_filters = self.can_manager.can_filters() if use_filters else None
+        self.bus = can.interface.Bus(channel=channel, interface=interface, receive_own_messages=False,
+                                     can_filters=self.can_filters)
+        self.can_manager.bus = self.bus
+        self.reader = can.AsyncBufferedReader()
+        self.notifier = None
+        self.running = False
+        self.handlers = {}  # order -> [coroutine functions], "*" for every order
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.stop()
+
+    async def start(self):
+        if self.notifier is None:
+            self.notifier = can.Notifier(self.bus, [self.reader], loop=asyncio.get_running_loop())
+        self.running = True
+        if self.verbose:
+            print("AsyncCANSystem: Listening on CAN bus...")
+
+    async def stop(self):
+        self.running = False
+        # Unblocks the iterators waiting on the reader
+        self.reader.buffer.put_nowait(None)
+        if self.notifier is not None:
+            self.notifier.stop()
+            self.notifier = None
+        self.bus.shutdown()
+
+    # ---------- reception ----------
+    def __aiter__(self):
+        return self.frames()
+
+    async def frames(self):
+        # Yields (device, order, data) for each frame addressed to this device
+        while self.running:
+            msg = await self.reader.get_message()
+            if msg is None:
+                return
+            device, order = self.can_manager.decode(msg.arbitration_id)
+            if device == self.device_name:
+                yield device, order, self.can_manager.decode_payload(order, msg.data)
+
+    def subscribe(self, order, handler):
+        """Registers `async def handler(device, order, data)` for an order, or "*" for all of them."""
+        self.handlers.setdefault(order, []).append(handler)
+
+    async def dispatch(self, device, order, data):
+        for handler in [*self.handlers.get(order, ()), *self.handlers.get("*", ())]:
+            try:
+                await handler(device, order, data)
+            except Exception as e:
+                print(f"AsyncCANSystem: handler error on {order}: {e}")
+
+    async def run(self):
+        # Dispatches the frames to the subscribed coroutines until stop()
+        if not self.running:
+            await self.start()
+        async for device, order, data in self:
+            await self.dispatch(device, order, data)
+
+    # ---------- sending ----------
+    async def send(self, device_id, order_id, data=None, timeout=None):
+        """
+        Sends a frame without blocking the event loop : when the socket buffer
+        is full, yields to the loop and retries until `timeout` (None = forever).
+        """
+        msg = self.can_manager.build_message(device_id, order_id, data)
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        while True:
+            try:
+                self.bus.send(msg, timeout=0)
+                return
+            except can.CanOperationError:
+                if deadline is not None and loop.time() >= deadline:
+                    raise
+                await asyncio.sleep(SEND_RETRY_DELAY)
@@ -0,0 +1,104 @@
+# File: CANAdapter.py
+# This file is part of the OBU project.
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the MIT License
+
+#----------------------------------------------------------------------------
+# Wrapper around CANSystem shared by the front and middle parts :
+# - centralises the CAN bus of a node : every adapter of a process shares one
+#   socket and RX thread per channel (CANBusHub), whatever its device name
+# - sends through the TX scheduler of CANSystem : send() never blocks the
+#   controller calling it (CANTxScheduler)
+# - dispatches each received frame to the handlers subscribed to its order
+#   (dict lookup by order, the cost does not grow with the number of controllers)
+# - handlers subscribed to "*" receive every frame
+# Handlers are called as handler(device, order, data).
+#----------------------------------------------------------------------------
+
+from .CANSystem import CANSystem
+
+WILDCARD = "*"
+
+
+class CANAdapter:
+    def __init__(self, device_name, channel='can0', interface='socketcan', verbose=False,
+                 queue_policy="priority", shared_bus=True, tx_scheduler=True, **can_kwargs):
+        self.device_name = device_name
+        self.verbose = verbose
+        # order -> tuple of handlers (replaced on subscribe, never mutated during a dispatch)
+        self._subscribers = {}
+        self.canSystem = CANSystem(device_name=device_name, channel=channel, interface=interface,
+                                   verbose=verbose, queue_policy=queue_policy, shared_bus=shared_bus,
+                                   tx_scheduler=tx_scheduler, **can_kwargs)
+        self.canSystem.set_callback(self._on_can)
+        self.canSystem.start_listening()
+        self.running = True
+
+    def _print(self, *args, **kwargs):
+        if self.verbose:
+            print("[CANAdapter]", *args, **kwargs)
+
+    # ---------- reception ----------
+    def subscribe(self, order, handler):
+        """Registers handler(device, order, data) for one order, or for every order with "*"."""
+        handlers = self._subscribers.get(order, ())
+        if handler not in handlers:
+            self._subscribers[order] = handlers + (handler,)
+
+    def unsubscribe(self, order, handler):
+        handlers = tuple(h for h in self._subscribers.get(order, ()) if h != handler)
+        if handlers:
+            self._subscribers[order] = handlers
+        else:
+            self._subscribers.pop(order, None)
+
+    def add_handler(self, handler):
+        """Registers a handler called for every received frame."""
+        self.subscribe(WILDCARD, handler)
+
+    def _on_can(self, device, order, data):
+        self._dispatch(self._subscribers.get(order, ()), device, order, data)
+        self._dispatch(self._subscribers.get(WILDCARD, ()), device, order, data)
+
+    def _dispatch(self, handlers, device, order, data):
+        for handler in handlers:
+            try:
+                handler(device, order, data)
+            except Exception as e:
+                self._print(f"handler error on {order}: {e}")
+
+    # ---------- sending ----------
+    def send(self, device_id, order_id, data=None):
+        self._print(f"Sending {device_id=} {order_id=} {data=}")
+        self.canSystem.can_send(device_id, order_id, data)
+
+    can_send = send
+
+    def request(self, device_id, order_id, data=None, ack_order="ready_ack", timeout=5.0, **retry):
+        """Request retransmitted until ack_order is received, see CANSystem.request(). Returns a Future."""
+        self._print(f"Request {device_id=} {order_id=} {ack_order=}")
+        return self.canSystem.request(device_id, order_id, data, ack_order=ack_order, timeout=timeout, **retry)
+
+    def expect(self, order_id, timeout=None):
+        return self.canSystem.expect(order_id, timeout=timeout)
+
+    def start_cyclic(self, device_id, order_id, data, period):
+        """Periodic frame sent by the kernel (BCM), see CANSystem.start_cyclic()."""
+        self._print(f"Cyclic {device_id=} {order_id=} {period=}")
+        return self.canSystem.start_cyclic(device_id, order_id, data, period)
+
+    def update_cyclic(self, device_id, order_id, data):
+        self.canSystem.update_cyclic(device_id, order_id, data)
+
+    def stop_cyclic(self, device_id, order_id):
+        self.canSystem.stop_cyclic(device_id, order_id)
+
+    # ---------- stop ----------
+    def stop(self):
+        if not self.running:
+            return
+        self.running = False
+        try:
+            self.canSystem.stop()
+        except Exception as e:
+            self._print("Error on stop():", e)
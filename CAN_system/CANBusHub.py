@@ -0,0 +1,115 @@
+# File: CANBusHub.py
+# This file is part of the OBU project.
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the MIT License
+
+#----------------------------------------------------------------------------
+# One CAN connection per (channel, interface) for the whole process.
+# Every CANSystem created with shared_bus=True (the default of CANAdapter)
+# attaches its receiver to the hub of its channel instead of opening its own
+# socket : the hub owns the bus and the only Notifier (RX) thread, and routes
+# each frame by the device bits of its id to the receivers of that device.
+# The acceptance filters of the socket are the union of the attached devices.
+# The socket receives its own frames : a frame sent to a device hosted in the
+# same process is delivered to it like any other.
+# A node can thus host several roles (OBU, BRAKE, STEER, test tools) with a
+# single socket. The hub is closed when its last user releases it.
+#
+#   hub = CANBusHub.acquire("can0", "socketcan")
+#   hub.attach(device_id, listener)   # device_id = None : every frame
+#   ...
+#   hub.detach(listener); hub.release()
+#----------------------------------------------------------------------------
+
+import threading
+
+import can
+
+# Same value as CANSystem.NOTIFIER_TIMEOUT (not imported : CANSystem imports this module)
+NOTIFIER_TIMEOUT = 0.2
+# Only matches an extended id nobody sends : nothing is received while no device is attached
+NO_DEVICE_FILTERS = [{"can_id": 0x1FFFFFFF, "can_mask": 0x1FFFFFFF, "extended": True}]
+
+
+class CANBusHub(can.Listener):
+    _hubs = {}  # (channel, interface) -> CANBusHub
+    _hubs_lock = threading.Lock()
+
+    @classmethod
+    def acquire(cls, channel='can0', interface='socketcan', verbose=False):
+        """Returns the hub of (channel, interface), opened on first use. Pair with release()."""
+        with cls._hubs_lock:
+            hub = cls._hubs.get((channel, interface))
+            if hub is None:
+                hub = cls(channel, interface, verbose)
+                cls._hubs[(channel, interface)] = hub
+            hub.users += 1
+            return hub
+
+    def __init__(self, channel, interface, verbose=False):
+        super().__init__()
+        self.channel = channel
+        self.interface = interface
+        self.verbose = verbose
+        self.users = 0
+        self.frames_received = 0
+        # device id -> tuple of listeners, replaced (never mutated) on attach/detach
+        self._routes = {}
+        self._catch_all = ()
+        self._lock = threading.Lock()
+        self.bus = can.interface.Bus(channel=channel, interface=interface, receive_own_messages=True,
+                                     can_filters=NO_DEVICE_FILTERS)
+        self.notifier = can.Notifier(self.bus, [self], timeout=NOTIFIER_TIMEOUT)
+        self._print(f"opened {interface}/{channel}")
+
+    def _print(self, *args, **kwargs):
+        if self.verbose:
+            print("[CANBusHub]", *args, **kwargs)
+
+    def attach(self, device_id, listener):
+        # device_id : device value of can_list.txt (DeviceID), None to receive every frame
+        with self._lock:
+            if device_id is None:
+                self._catch_all += (listener,)
+            else:
+                self._routes[device_id] = self._routes.get(device_id, ()) + (listener,)
+            self._update_filters()
+
+    def detach(self, listener):
+        with self._lock:
+            self._catch_all = tuple(l for l in self._catch_all if l is not listener)
+            routes = {}
+            for device_id, listeners in self._routes.items():
+                listeners = tuple(l for l in listeners if l is not listener)
+                if listeners:
+                    routes[device_id] = listeners
+            self._routes = routes
+            self._update_filters()
+
+    def _update_filters(self):
+        if self._catch_all:
+            filters = None
+        elif self._routes:
+            filters = [{"can_id": device_id << 8, "can_mask": 0x700, "extended": False}
+                       for device_id in sorted(self._routes)]
+        else:
+            filters = NO_DEVICE_FILTERS
+        self.bus.set_filters(filters)
+        self._print(f"acceptance filters = {filters}")
+
+    def on_message_received(self, msg):
+        self.frames_received += 1
+        for listener in self._routes.get(msg.arbitration_id >> 8, ()):
+            listener.on_message_received(msg)
+        for listener in self._catch_all:
+            listener.on_message_received(msg)
+
+    def release(self):
+        with CANBusHub._hubs_lock:
+            self.users -= 1
+            if self.users > 0:
+                return
+            CANBusHub._hubs.pop((self.channel, self.interface), None)
+        self.notifier.stop()
+        self.bus.shutdown()
+        self._print(f"closed {self.interface}/{self.channel}")
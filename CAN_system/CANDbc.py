@@ -0,0 +1,214 @@
+# File: CANDbc.py
+# This file is part of the OBU project.
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the MIT License
+
+#----------------------------------------------------------------------------
+# DBC import / export of the CAN schema, to use off-the-shelf bus analysers
+# (SavvyCAN, cantools, Vector tools, ...) on the VACOP bus.
+# - export : one message per (device, order) named DEVICE_order, DEVICE being
+#   the addressee; orders with a Signals layout get their signals, the other
+#   orders carry a big-endian integer of variable length, which DBC cannot
+#   describe : they are exported without signal, with a comment.
+#   OrderKind, OrderPriority and TxMinInterval are kept as message attributes.
+# - import : CANManager(can_list_path="....dbc") loads a DBC file instead of
+#   can_list.txt. The built-in parser reads BU_, BO_, SG_ and the attributes
+#   above; cantools is used instead when it is installed (use_cantools).
+# The decoders of the messages are generated once at load time (SignalLayout).
+#
+# Execute : python3 -m CAN_system.CANDbc export -o vacop.dbc
+#           python3 -m CAN_system.CANDbc show vacop.dbc
+#----------------------------------------------------------------------------
+
+import argparse
+import re
+
+from .CANSignals import Signal, SignalLayout
+
+try:
+    import cantools
+except ImportError:
+    cantools = None
+
+DBC_EXTENSION = ".dbc"
+# Attributes carrying the sections of can_list.txt that DBC has no keyword for
+ATTRIBUTES = {"VacopOrderKind": "OrderKind", "VacopOrderPriority": "OrderPriority",
+              "VacopTxMinInterval": "TxMinInterval"}
+
+BO_RE = re.compile(r'^BO_\s+(\d+)\s+(\w+)\s*:\s*(\d+)\s+(\w+)')
+SG_RE = re.compile(r'^SG_\s+(\w+)\s*(?:\w+\s*)?:\s*(\d+)\|(\d+)@([01])([+-])\s*'
+                   r'\(([^,]+),([^)]+)\)\s*\[([^|]*)\|([^\]]*)\]\s*"([^"]*)"')
+BU_RE = re.compile(r'^BU_\s*:(.*)')
+BA_RE = re.compile(r'^BA_\s+"(\w+)"\s+BO_\s+(\d+)\s+"?([^";]*)"?\s*;')
+
+
+def _number(text):
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
+
+
+class DbcMessage:
+    def __init__(self, frame_id, name, size, sender, signals):
+        self.frame_id = frame_id
+        self.name = name
+        self.size = size
+        self.sender = sender
+        self.signals = tuple(signals)
+        # Compiled decoder, None for a message without signals
+        self.layout = SignalLayout(name, self.signals, size) if self.signals else None
+
+
+class DbcDatabase:
+    def __init__(self, messages, nodes=(), attributes=None):
+        self.messages = {message.frame_id: message for message in messages}
+        self.nodes = list(nodes)
+        self.attributes = attributes or {}  # (attribute, frame id) -> value
+
+    def decode(self, frame_id, data):
+        return self.messages[frame_id].layout.unpack(data)
+
+    def sections(self):
+        """DeviceID / OrderID / OrderKind / OrderPriority / TxMinInterval sections, as read from can_list.txt."""
+        sections = {"DeviceID": {}, "OrderID": {}}
+        for message in self.messages.values():
+            device, order = split_name(message.name)
+            sections["DeviceID"][device] = f"{message.frame_id >> 8:02x}"
+            sections["OrderID"][order] = f"{message.frame_id & 0xFF:02x}"
+            for attribute, section in ATTRIBUTES.items():
+                value = self.attributes.get((attribute, message.frame_id))
+                if value:
+                    sections.setdefault(section, {})[order] = value
+        return sections
+
+    def layouts(self):
+        # {order: SignalLayout} of the messages with signals
+        return {split_name(message.name)[1]: message.layout
+                for message in self.messages.values() if message.layout is not None}
+
+
+def split_name(name):
+    # "STEER_steer_pos_set" -> ("STEER", "steer_pos_set") (device names have no underscore)
+    device, _, order = name.partition("_")
+    return device, order
+
+
+def parse_dbc(text):
+    messages, nodes, attributes = [], [], {}
+    current = None
+    for line in text.splitlines():
+        line = line.strip()
+        if line.startswith("BO_ "):
+            match = BO_RE.match(line)
+            if match:
+                current = [int(match.group(1)) & 0x1FFFFFFF, match.group(2), int(match.group(3)),
+                           match.group(4), []]
+                messages.append(current)
+        elif line.startswith("SG_ ") and current is not None:
+            match = SG_RE.match(line)
+            if match is None:
+                raise ValueError(f"Unsupported signal definition: {line}")
+            name, start, length, order, sign, scale, offset, _, _, unit = match.groups()
+            current[4].append(Signal(name, int(start), int(length), _number(scale.strip()), sign == "-",
+                                     _number(offset.strip()), order == "1", unit))
+        elif line.startswith("BU_"):
+            nodes = BU_RE.match(line).group(1).split()
+        elif line.startswith("BA_ "):
+            match = BA_RE.match(line)
+            if match and match.group(1) in ATTRIBUTES:
+                attributes[(match.group(1), int(match.group(2)))] = match.group(3)
+        elif not line:
+            current = None
+    return DbcDatabase([DbcMessage(*message) for message in messages], nodes, attributes)
+
+
+def _from_cantools(database):
+    messages = []
+    attributes = {}
+    for message in database.messages:
+        signals = [Signal(signal.name, signal.start, signal.length, signal.scale, signal.is_signed,
+                          signal.offset, signal.byte_order == "little_endian", signal.unit or "")
+                   for signal in message.signals]
+        messages.append(DbcMessage(message.frame_id, message.name, message.length,
+                                   (message.senders or ["Vector__XXX"])[0], signals))
+        dbc_specifics = getattr(message, "dbc", None)
+        for attribute in ATTRIBUTES:
+            if dbc_specifics is not None and attribute in dbc_specifics.attributes:
+                attributes[(attribute, message.frame_id)] = str(dbc_specifics.attributes[attribute].value)
+    return DbcDatabase(messages, [node.name for node in database.nodes], attributes)
+
+
+def load_dbc(path, use_cantools=None):
+    # use_cantools : None = when installed, False = built-in parser
+    if use_cantools is None:
+        use_cantools = cantools is not None
+    if use_cantools:
+        if cantools is None:
+            raise ImportError("cantools is not installed (pip install cantools)")
+        return _from_cantools(cantools.database.load_file(path, database_format="dbc"))
+    with open(path, encoding="utf-8", errors="replace") as file:
+        return parse_dbc(file.read())
+
+
+def dump_dbc(manager):
+    """DBC text of the schema of a CANManager (can_list.txt)."""
+    devices = list(manager.device_id_map)
+    lines = ['VERSION ""', "", "NS_ :", "", "BS_:", "", f"BU_: {' '.join(devices)}", ""]
+    comments, attribute_values = [], []
+    for (device, order), arbitration_id in sorted(manager.arbitration_id_map.items(), key=lambda item: item[1]):
+        layout = manager.signal_layouts.get(order)
+        size = layout.size if layout is not None else 8
+        lines.append(f"BO_ {arbitration_id} {device}_{order}: {size} Vector__XXX")
+        if layout is None:
+            comments.append(f'CM_ BO_ {arbitration_id} "Unsigned big-endian integer, variable length";')
+        else:
+            for signal in layout.signals:
+                minimum = signal.minimum * signal.scale + signal.offset
+                maximum = signal.maximum * signal.scale + signal.offset
+                lines.append(f" SG_ {signal.name} : {signal.start}|{signal.length}@{1 if signal.little_endian else 0}"
+                             f"{'-' if signal.signed else '+'} ({signal.scale},{signal.offset}) "
+                             f"[{minimum}|{maximum}] \"{signal.unit}\" Vector__XXX")
+        lines.append("")
+        for attribute, section in ATTRIBUTES.items():
+            value = manager.sections.get(section, {}).get(order)
+            if value is not None:
+                attribute_values.append(f'BA_ "{attribute}" BO_ {arbitration_id} "{value}";')
+    lines += comments + [""]
+    lines += [f'BA_DEF_ BO_ "{attribute}" STRING ;' for attribute in ATTRIBUTES]
+    lines += [f'BA_DEF_DEF_ "{attribute}" "";' for attribute in ATTRIBUTES]
+    lines += attribute_values
+    return "\n".join(lines) + "\n"
+
+
+def export_dbc(manager, path):
+    with open(path, "w") as file:
+        file.write(dump_dbc(manager))
+
+
+def main():
+    from .CANSystem import CANManager
+
+    parser = argparse.ArgumentParser(description="DBC import / export of can_list.txt")
+    sub = parser.add_subparsers(dest="command", required=True)
+    export = sub.add_parser("export", help="Write can_list.txt as a DBC file")
+    export.add_argument("-o", "--output", required=True)
+    export.add_argument("--can-list", default=None, help="Default : CAN_system/can_list.txt")
+    show = sub.add_parser("show", help="Print the messages and signals of a DBC file")
+    show.add_argument("input")
+    show.add_argument("--builtin", action="store_true", help="Do not use cantools")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        manager = CANManager(bus=None, device_name=None, can_list_path=args.can_list)
+        export_dbc(manager, args.output)
+        print(f"{len(manager.arbitration_id_map)} messages written to {args.output}")
+    else:
+        database = load_dbc(args.input, use_cantools=False if args.builtin else None)
+        for frame_id, message in sorted(database.messages.items()):
+            signals = ", ".join(signal.name for signal in message.signals) or "-"
+            print(f"{frame_id:03X} {message.name:<28} {message.size} {signals}")
+
+
+if __name__ == "__main__":
+    main()
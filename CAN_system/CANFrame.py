@@ -0,0 +1,57 @@
+# File: CANFrame.py
+# This file is part of the OBU project.
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the MIT License
+
+#----------------------------------------------------------------------------
+# Compact frame representation of the receive path.
+# The CANReceiver copies each can.Message into a FrameRecord taken from a
+# preallocated FramePool and lets the message go : frames waiting in the
+# queue or in a mailbox no longer keep a can.Message (and its data buffer)
+# alive, and records are reused from one frame to the next.
+#----------------------------------------------------------------------------
+
+
+class FrameRecord:
+    __slots__ = ("timestamp", "arbitration_id", "dlc", "data")
+
+    def __init__(self):
+        self.timestamp = 0.0
+        self.arbitration_id = 0
+        self.dlc = 0
+        self.data = bytearray(8)
+
+    def load(self, msg):
+        dlc = msg.dlc
+        self.timestamp = msg.timestamp
+        self.arbitration_id = msg.arbitration_id
+        self.dlc = dlc
+        self.data[:dlc] = msg.data
+        return self
+
+    def integer(self):
+        # Payload read as a big-endian integer, as sent by CANManager.can_send().
+        # Computed at dispatch only : a frame replaced in its mailbox is never converted.
+        # The bytes past the DLC (left by a previous frame) are shifted out.
+        dlc = self.dlc
+        return int.from_bytes(self.data, byteorder='big') >> (64 - 8 * dlc) if dlc else 0
+
+
+class FramePool:
+    def __init__(self, size):
+        self.size = size
+        self._free = [FrameRecord() for _ in range(size)]
+        # Records allocated because the pool was empty
+        self.misses = 0
+
+    def acquire(self, msg):
+        try:
+            record = self._free.pop()
+        except IndexError:
+            self.misses += 1
+            record = FrameRecord()
+        return record.load(msg)
+
+    def release(self, record):
+        if len(self._free) < self.size:
+            self._free.append(record)
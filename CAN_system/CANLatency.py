@@ -0,0 +1,97 @@
+# File: CANLatency.py
+# This file is part of the OBU project.
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the MIT License
+
+#----------------------------------------------------------------------------
+# Latency statistics of the CANSystem receive path, per order and per stage :
+# - "socket"  : socket timestamp (msg.timestamp) -> frame handed over by the Notifier
+# - "queue"   : Notifier -> frame taken out of the receive queue
+# - "handler" : execution time of the user callback
+# - "total"   : socket timestamp -> end of the user callback
+# Only the last SAMPLES_PER_STAGE samples are kept, percentiles are computed
+# when the statistics are read.
+#----------------------------------------------------------------------------
+
+import collections
+import threading
+import time
+
+SAMPLES_PER_STAGE = 2048
+STAGES = ("socket", "queue", "handler", "total")
+
+
+def percentile(sorted_samples, ratio):
+    index = min(len(sorted_samples) - 1, int(round(ratio * (len(sorted_samples) - 1))))
+    return sorted_samples[index]
+
+
+class LatencyStats:
+    def __init__(self, samples_per_stage=SAMPLES_PER_STAGE):
+        self.samples_per_stage = samples_per_stage
+        self._samples = {}  # (order, stage) -> deque of seconds
+        self._lock = threading.Lock()
+        self.queue_depth_max = 0
+        self.queue_depth_last = 0
+
+    def add(self, order, stage, seconds):
+        samples = self._samples.get((order, stage))
+        if samples is None:
+            with self._lock:
+                samples = self._samples.setdefault((order, stage),
+                                                   collections.deque(maxlen=self.samples_per_stage))
+        samples.append(seconds)
+
+    def add_queue_depth(self, depth):
+        self.queue_depth_last = depth
+        if depth > self.queue_depth_max:
+            self.queue_depth_max = depth
+
+    def snapshot(self):
+        """{order: {stage: {"count", "p50_ms", "p99_ms", "max_ms"}}, plus "queue_depth"}"""
+        with self._lock:
+            items = list(self._samples.items())
+        result = {}
+        for (order, stage), samples in items:
+            values = sorted(samples)
+            if not values:
+                continue
+            result.setdefault(order, {})[stage] = {
+                "count": len(values),
+                "p50_ms": percentile(values, 0.50) * 1000.0,
+                "p99_ms": percentile(values, 0.99) * 1000.0,
+                "max_ms": values[-1] * 1000.0,
+            }
+        result["queue_depth"] = {"last": self.queue_depth_last, "max": self.queue_depth_max}
+        return result
+
+    def format(self):
+        snapshot = self.snapshot()
+        depth = snapshot.pop("queue_depth")
+        lines = [f"queue depth last={depth['last']} max={depth['max']}"]
+        for order in sorted(snapshot):
+            stages = snapshot[order]
+            parts = [
+                f"{stage} p50={stages[stage]['p50_ms']:.2f} p99={stages[stage]['p99_ms']:.2f} "
+                f"max={stages[stage]['max_ms']:.2f}"
+                for stage in STAGES if stage in stages
+            ]
+            lines.append(f"{order:<16} n={max(s['count'] for s in stages.values()):<5} " + " | ".join(parts))
+        return "\n".join(lines)
+
+
+class LatencyDumper(threading.Thread):
+    # Prints LatencyStats.format() every `period` seconds until stop()
+    def __init__(self, stats, period, printer=print):
+        super().__init__(name="CANLatencyDumper", daemon=True)
+        self.stats = stats
+        self.period = period
+        self.printer = printer
+        self._stop_evt = threading.Event()
+
+    def run(self):
+        while not self._stop_evt.wait(self.period):
+            self.printer(f"[CANLatency] {time.strftime('%H:%M:%S')} (ms)\n{self.stats.format()}")
+
+    def stop(self):
+        self._stop_evt.set()
@@ -0,0 +1,128 @@
+# File: CANMonitor.py
+# This file is part of the OBU project.
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the MIT License
+
+#----------------------------------------------------------------------------
+# Passive bus load monitor.
+# Over a sliding window, gives for each device/order the frames per second,
+# the payload bytes per second and the share of the bus it uses, and the
+# total bus utilisation as a percentage of the bitrate (1 Mbit/s on the VACOP).
+# The size of a frame on the wire counts the worst case bit stuffing of a
+# standard (11-bit) data frame.
+#
+# Inside a node :  monitor = CANMonitor(can_system.can_manager)
+#                  can_system.add_listener(monitor) ... monitor.stats()
+# Standalone :     python3 -m CAN_system.CANMonitor -c can0 --bitrate 1000000
+#----------------------------------------------------------------------------
+
+import argparse
+import collections
+import threading
+import time
+
+import can
+
+from .CANSystem import CANManager
+
+DEFAULT_BITRATE = 1000000
+DEFAULT_WINDOW = 1.0
+
+
+def frame_bits(dlc):
+    # SOF + 11-bit id + RTR + IDE + r0 + DLC + data + CRC (34 + 8*dlc bits subject to stuffing),
+    # worst case stuffing, then CRC delimiter, ACK, EOF and interframe space (13 bits)
+    stuffed = 34 + 8 * dlc
+    return stuffed + (stuffed - 1) // 4 + 13
+
+
+class CANMonitor(can.Listener):
+    def __init__(self, manager: CANManager, bitrate=DEFAULT_BITRATE, window=DEFAULT_WINDOW):
+        super().__init__()
+        self.manager = manager
+        self.bitrate = bitrate
+        self.window = window
+        self._frames = collections.deque()  # (monotonic time, arbitration id, dlc)
+        self._lock = threading.Lock()
+        self.total_frames = 0
+
+    def on_message_received(self, msg):
+        now = time.monotonic()
+        with self._lock:
+            self._frames.append((now, msg.arbitration_id, msg.dlc))
+            self.total_frames += 1
+            self._prune(now)
+
+    def _prune(self, now):
+        limit = now - self.window
+        frames = self._frames
+        while frames and frames[0][0] < limit:
+            frames.popleft()
+
+    def stats(self):
+        """
+        {"bus_load_pct", "frames_per_s", "orders": {(device, order): {"frames_per_s",
+        "bytes_per_s", "load_pct"}}} over the last `window` seconds.
+        """
+        with self._lock:
+            self._prune(time.monotonic())
+            frames = list(self._frames)
+
+        per_id = {}
+        for _, arbitration_id, dlc in frames:
+            counters = per_id.setdefault(arbitration_id, [0, 0, 0])
+            counters[0] += 1
+            counters[1] += dlc
+            counters[2] += frame_bits(dlc)
+
+        orders = {}
+        total_bits = 0
+        for arbitration_id, (count, payload, bits) in per_id.items():
+            total_bits += bits
+            orders[self.manager.decode(arbitration_id)] = {
+                "frames_per_s": count / self.window,
+                "bytes_per_s": payload / self.window,
+                "load_pct": bits / self.window / self.bitrate * 100.0,
+            }
+        return {
+            "bus_load_pct": total_bits / self.window / self.bitrate * 100.0,
+            "frames_per_s": len(frames) / self.window,
+            "orders": orders,
+        }
+
+    def format(self):
+        stats = self.stats()
+        lines = [f"bus load {stats['bus_load_pct']:5.1f} %  ({stats['frames_per_s']:.0f} frames/s)"]
+        ranked = sorted(stats["orders"].items(), key=lambda item: item[1]["load_pct"], reverse=True)
+        for (device, order), values in ranked:
+            lines.append(f"  {device:<8} {order:<18} {values['frames_per_s']:8.1f} fr/s "
+                         f"{values['bytes_per_s']:8.1f} B/s {values['load_pct']:6.2f} %")
+        return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CAN bus load monitor")
+    parser.add_argument("-c", "--channel", default="can0")
+    parser.add_argument("-i", "--interface", default="socketcan")
+    parser.add_argument("--bitrate", type=int, default=DEFAULT_BITRATE)
+    parser.add_argument("--window", type=float, default=DEFAULT_WINDOW, help="Sliding window (s)")
+    parser.add_argument("--period", type=float, default=1.0, help="Display period (s)")
+    args = parser.parse_args()
+
+    monitor = CANMonitor(CANManager(bus=None, device_name="MONITOR"), bitrate=args.bitrate, window=args.window)
+    # The monitor is the only listener : no CANSystem receive path adding its
+    # own work to the load being measured
+    with can.interface.Bus(channel=args.channel, interface=args.interface) as bus:
+        notifier = can.Notifier(bus, [monitor])
+        try:
+            while True:
+                time.sleep(args.period)
+                print(f"[{time.strftime('%H:%M:%S')}] {monitor.format()}")
+        except KeyboardInterrupt:
+            pass
+        finally:
+            notifier.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+# File: CANQueue.py
+# This file is part of the OBU project.
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the MIT License
+
+#----------------------------------------------------------------------------
+# Receive queue of CANSystem with a selectable scheduling policy :
+# - "fifo"     : frames are dispatched in arrival order
+# - "priority" : static priority of the order (lower value first), FIFO inside a priority
+# - "edf"      : earliest deadline first, deadline = arrival + deadline of the order
+# Priorities and deadlines are declared per order in can_list.txt (OrderPriority).
+#
+# The queue can be bounded (capacity). When it is full, the overflow policy decides :
+# - "drop_oldest" : the frame that has been waiting the longest is discarded
+# - "drop_newest" : the incoming frame is discarded
+# - "coalesce"    : the incoming frame replaces a queued frame with the same
+#                   arbitration id (keeping its place), otherwise drop_oldest
+#----------------------------------------------------------------------------
+
+import heapq
+import itertools
+import queue
+import threading
+import time
+
+QUEUE_POLICIES = ("fifo", "priority", "edf")
+OVERFLOW_POLICIES = ("drop_oldest", "drop_newest", "coalesce")
+
+
+class RxQueue:
+    def __init__(self, policy="fifo", capacity=None, overflow="drop_oldest"):
+        if policy not in QUEUE_POLICIES:
+            raise ValueError(f"Unknown queue policy '{policy}' (expected one of {QUEUE_POLICIES})")
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy '{overflow}' (expected one of {OVERFLOW_POLICIES})")
+        self.policy = policy
+        self.capacity = capacity
+        self.overflow = overflow
+        self._heap = []
+        self._counter = itertools.count()
+        self._cond = threading.Condition(threading.Lock())
+        self._wakeups = 0
+
+    def _key(self, priority, deadline):
+        if self.policy == "priority":
+            return priority
+        if self.policy == "edf":
+            return deadline
+        return 0
+
+    def put(self, item, priority, deadline, enqueued_at, key=None):
+        """
+        Queues item. `key` identifies frames that may replace each other
+        (arbitration id) for the "coalesce" overflow policy.
+        Returns the item discarded because the queue was full, or None.
+        """
+        entry = (self._key(priority, deadline), next(self._counter), enqueued_at, deadline, item, key)
+        with self._cond:
+            dropped = None
+            if self.capacity is not None and len(self._heap) >= self.capacity:
+                if self.overflow == "drop_newest":
+                    return item
+                if self.overflow == "coalesce" and key is not None:
+                    for index, queued in enumerate(self._heap):
+                        if queued[5] == key:
+                            # Same sort key and sequence : the heap order is unchanged
+                            self._heap[index] = queued[:4] + (item, key)
+                            self._cond.notify()
+                            return queued[4]
+                dropped = self._drop_oldest()
+            heapq.heappush(self._heap, entry)
+            self._cond.notify()
+            return dropped
+
+    def _drop_oldest(self):
+        index = min(range(len(self._heap)), key=lambda i: self._heap[i][1])
+        dropped = self._heap[index][4]
+        last = self._heap.pop()
+        if index < len(self._heap):
+            self._heap[index] = last
+            heapq.heapify(self._heap)
+        return dropped
+
+    def wake(self):
+        # Makes one blocked get() return None, ahead of any pending frame
+        with self._cond:
+            self._wakeups += 1
+            self._cond.notify()
+
+    def get(self, block=True, timeout=None):
+        """
+        Returns (item, enqueued_at, deadline), or None after a wake().
+        Raises queue.Empty when nothing is available in time.
+        """
+        with self._cond:
+            if block:
+                end = None if timeout is None else time.monotonic() + timeout
+                while not self._heap and not self._wakeups:
+                    remaining = None if end is None else end - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        raise queue.Empty
+                    self._cond.wait(remaining)
+            if self._wakeups:
+                self._wakeups -= 1
+                return None
+            if not self._heap:
+                raise queue.Empty
+            _, _, enqueued_at, deadline, item, _ = heapq.heappop(self._heap)
+            return item, enqueued_at, deadline
+
+    def qsize(self):
+        with self._cond:
+            return len(self._heap)
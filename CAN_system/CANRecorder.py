@@ -0,0 +1,176 @@
+# File: CANRecorder.py
+# This file is part of the OBU project.
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the MIT License
+
+#----------------------------------------------------------------------------
+# Recording and replay of CAN sessions.
+# - CANRecorder : listener added to a CANSystem (add_listener) that writes every
+#   frame it sees. The ".vlog" native format stores one frame per line along
+#   with its decoded device/order/data; any other extension supported by
+#   python-can (.asc, .blf, .csv, .log, ...) goes through can.Logger.
+# - CANReplayer : sends a recording onto a bus (vcan, virtual, ...) at 1x, Nx
+#   or as fast as possible (speed=0).
+# - replay_to_callback() : feeds a recording straight into a callback
+#   (e.g. OBU.on_can_message) and measures how many frames/s it keeps up with.
+#
+# Execute : python3 -m CAN_system.CANRecorder record -o drive.vlog
+#           python3 -m CAN_system.CANRecorder replay drive.vlog -c vcan0 --speed 2
+#           python3 -m CAN_system.CANRecorder bench drive.vlog
+#----------------------------------------------------------------------------
+
+import argparse
+import os
+import threading
+import time
+
+import can
+
+from .CANSystem import CANManager
+
+NATIVE_EXTENSION = ".vlog"
+
+
+class CANRecorder(can.Listener):
+    def __init__(self, path, manager: CANManager):
+        super().__init__()
+        self.path = path
+        self.manager = manager
+        self.frames = 0
+        self._lock = threading.Lock()
+        if path.endswith(NATIVE_EXTENSION):
+            self._file = open(path, "w")
+            self._file.write("# timestamp arbitration_id data device order value\n")
+            self._logger = None
+        else:
+            self._file = None
+            self._logger = can.Logger(path)
+
+    def on_message_received(self, msg):
+        with self._lock:
+            self.frames += 1
+            if self._logger is not None:
+                self._logger.on_message_received(msg)
+                return
+            device, order = self.manager.decode(msg.arbitration_id)
+            value = self.manager.decode_payload(order, msg.data)
+            if isinstance(value, dict):
+                value = ",".join(f"{name}={signal}" for name, signal in value.items())
+            self._file.write(f"{msg.timestamp:.6f} {msg.arbitration_id:03X} {msg.data.hex() or '-'} "
+                             f"{device} {order} {value}\n")
+
+    def stop(self):
+        with self._lock:
+            if self._logger is not None:
+                self._logger.stop()
+            elif not self._file.closed:
+                self._file.close()
+
+
+def read_recording(path):
+    # Yields the recorded frames as can.Message
+    if not path.endswith(NATIVE_EXTENSION):
+        yield from can.LogReader(path)
+        return
+    with open(path) as file:
+        for line in file:
+            if line.startswith("#") or not line.strip():
+                continue
+            timestamp, arbitration_id, data = line.split()[:3]
+            yield can.Message(timestamp=float(timestamp), arbitration_id=int(arbitration_id, 16),
+                              data=b'' if data == '-' else bytes.fromhex(data), is_extended_id=False)
+
+
+class CANReplayer:
+    def __init__(self, bus, path, speed=1.0, verbose=False):
+        # speed : 1.0 = real time, 2.0 = twice as fast, 0 = as fast as possible
+        self.bus = bus
+        self.path = path
+        self.speed = speed
+        self.verbose = verbose
+        self.frames = 0
+
+    def run(self):
+        start = None
+        first_timestamp = None
+        for msg in read_recording(self.path):
+            if self.speed > 0:
+                if start is None:
+                    start, first_timestamp = time.monotonic(), msg.timestamp
+                # Deadlines relative to the first frame, no drift accumulation
+                delay = start + (msg.timestamp - first_timestamp) / self.speed - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            self.bus.send(msg)
+            self.frames += 1
+        if self.verbose:
+            print(f"CANReplayer: {self.frames} frames replayed from {self.path}")
+        return self.frames
+
+
+def replay_to_callback(path, callback, manager: CANManager, device_name=None):
+    """
+    Decodes every frame of a recording and calls callback(device, order, data)
+    as fast as possible. Frames addressed to another device than device_name
+    are skipped (all of them are delivered when device_name is None).
+    Returns (frames, frames per second).
+    """
+    decoded = []
+    for msg in read_recording(path):
+        device, order = manager.decode(msg.arbitration_id)
+        if device_name is None or device == device_name:
+            decoded.append((device, order, manager.decode_payload(order, msg.data)))
+    start = time.perf_counter()
+    for device, order, data in decoded:
+        callback(device, order, data)
+    elapsed = time.perf_counter() - start
+    return len(decoded), (len(decoded) / elapsed if elapsed > 0 else float("inf"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CAN session recorder / replayer")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    record = sub.add_parser("record", help="Record every frame of the bus")
+    record.add_argument("-o", "--output", required=True, help="Output file (.vlog, .asc, .blf, ...)")
+    record.add_argument("-c", "--channel", default="can0")
+    record.add_argument("-i", "--interface", default="socketcan")
+
+    replay = sub.add_parser("replay", help="Send a recording onto a bus")
+    replay.add_argument("input")
+    replay.add_argument("-c", "--channel", default="vcan0")
+    replay.add_argument("-i", "--interface", default="socketcan")
+    replay.add_argument("--speed", type=float, default=1.0, help="Time scale, 0 = as fast as possible")
+
+    bench = sub.add_parser("bench", help="Decode a recording and dispatch it to a no-op callback")
+    bench.add_argument("input")
+    bench.add_argument("-d", "--device", default=None, help="Only frames addressed to this device")
+    args = parser.parse_args()
+
+    if args.command == "record":
+        recorder = CANRecorder(args.output, CANManager(bus=None, device_name="RECORDER"))
+        # The recorder is the only listener : no CANSystem receive path decoding
+        # and queueing every frame for nobody
+        with can.interface.Bus(channel=args.channel, interface=args.interface) as bus:
+            notifier = can.Notifier(bus, [recorder])
+            print(f"Recording {args.channel} into {args.output} (Ctrl+C to stop)")
+            try:
+                while True:
+                    time.sleep(1)
+            except KeyboardInterrupt:
+                pass
+            finally:
+                notifier.stop()
+                recorder.stop()
+                print(f"{recorder.frames} frames recorded.")
+    elif args.command == "replay":
+        with can.interface.Bus(channel=args.channel, interface=args.interface) as bus:
+            CANReplayer(bus, args.input, speed=args.speed, verbose=True).run()
+    else:
+        manager = CANManager(bus=None, device_name=args.device)
+        frames, rate = replay_to_callback(args.input, lambda *_: None, manager, device_name=args.device)
+        print(f"{frames} frames dispatched, {rate:,.0f} frames/s ({os.path.basename(args.input)})")
+
+
+if __name__ == "__main__":
+    main()
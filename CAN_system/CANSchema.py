@@ -0,0 +1,127 @@
+# File: CANSchema.py
+# This file is part of the OBU project.
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the MIT License
+
+#----------------------------------------------------------------------------
+# CAN schema (can_list.txt or a DBC file) compiled into read-only lookup
+# tables : device/order ids, arbitration ids in both directions, order kinds,
+# priorities/deadlines, TX minimum intervals and signal layouts.
+# - the default schema is found next to this file, whatever the working directory
+# - inside a process, every CANManager of the same schema shares one instance :
+#   the file is parsed and compiled once, by the first CANManager
+#----------------------------------------------------------------------------
+
+import os
+import re
+import threading
+from types import MappingProxyType
+
+from .CANSignals import parse_layouts
+from .CANDbc import DBC_EXTENSION, load_dbc
+
+DEFAULT_CAN_LIST = os.path.join(os.path.dirname(os.path.abspath(__file__)), "can_list.txt")
+# (priority, deadline in seconds) of the orders missing from the OrderPriority section
+DEFAULT_ORDER_POLICY = (2, 0.1)
+
+_schemas = {}  # absolute path -> CANSchema
+_schemas_lock = threading.Lock()
+
+
+def load_can_list(filename):
+    # Returns {section_name: {key: value}} for every "Name: { key = value }" block
+    with open(filename, 'r') as file:
+        content = file.read()
+
+    sections = {}
+    for section in re.finditer(r'(\w+):\s*{([^}]*)}', content):
+        target_map = sections.setdefault(section.group(1), {})
+        for line in section.group(2).strip().split('\n'):
+            if '=' in line:
+                key, value = map(str.strip, line.split('=', 1))
+                target_map[key] = value
+    return sections
+
+
+def compile_tables(sections, signal_layouts):
+    """Lookup tables of a schema from its sections and {order: SignalLayout}."""
+    device_id_map = sections.get("DeviceID", {})
+    order_id_map = sections.get("OrderID", {})
+    order_kind_map = sections.get("OrderKind", {})
+    # (device, order) <-> arbitration id, computed once so that the send and
+    # receive paths never format or parse hex strings
+    arbitration_id_map, arbitration_id_reverse_map = {}, {}
+    for device, device_value in device_id_map.items():
+        for order, order_value in order_id_map.items():
+            arbitration_id = (int(device_value, 16) << 8) | int(order_value, 16)
+            arbitration_id_map[(device, order)] = arbitration_id
+            arbitration_id_reverse_map[arbitration_id] = (device, order)
+    order_policy_map = {}
+    for order, value in sections.get("OrderPriority", {}).items():
+        priority, deadline_ms = map(str.strip, value.split(','))
+        order_policy_map[order] = (int(priority), float(deadline_ms) / 1000.0)
+    return {
+        "sections": sections,
+        "device_id_map": device_id_map,
+        "order_id_map": order_id_map,
+        "device_id_reverse_map": {value: key for key, value in device_id_map.items()},
+        "order_id_reverse_map": {value: key for key, value in order_id_map.items()},
+        "order_kind_map": order_kind_map,
+        "arbitration_id_map": arbitration_id_map,
+        "arbitration_id_reverse_map": arbitration_id_reverse_map,
+        "state_arbitration_ids": frozenset(
+            arbitration_id for (_, order), arbitration_id in arbitration_id_map.items()
+            if order_kind_map.get(order) == "state"
+        ),
+        "order_policy_map": order_policy_map,
+        "arbitration_policy_map": {
+            arbitration_id: order_policy_map.get(order, DEFAULT_ORDER_POLICY)
+            for (_, order), arbitration_id in arbitration_id_map.items()
+        },
+        "tx_min_interval_map": {
+            order: float(value) / 1000.0 for order, value in sections.get("TxMinInterval", {}).items()
+        },
+        "signal_layouts": signal_layouts,
+    }
+
+
+def parse_schema(path):
+    # (sections, {order: SignalLayout}) of a can_list.txt or DBC file
+    if path.endswith(DBC_EXTENSION):
+        database = load_dbc(path)
+        return database.sections(), database.layouts()
+    sections = load_can_list(path)
+    return sections, parse_layouts(sections.get("Signals", {}))
+
+
+class CANSchema:
+    def __init__(self, path, tables):
+        self.path = path
+        for name, value in tables.items():
+            if isinstance(value, dict):
+                if name == "sections":
+                    value = {section: MappingProxyType(entries) for section, entries in value.items()}
+                value = MappingProxyType(value)
+            setattr(self, name, value)
+
+    def __setattr__(self, name, value):
+        if name in self.__dict__:
+            raise AttributeError(f"CANSchema is read-only ({name})")
+        super().__setattr__(name, value)
+
+
+def load_schema(path=None):
+    """Compiled schema of can_list.txt (path=None) or of the given can_list/DBC file."""
+    path = os.path.abspath(path or DEFAULT_CAN_LIST)
+    with _schemas_lock:
+        schema = _schemas.get(path)
+        if schema is None:
+            schema = CANSchema(path, compile_tables(*parse_schema(path)))
+            _schemas[path] = schema
+        return schema
+
+
+def clear_schemas():
+    # Forgets the schemas loaded in this process : the next load parses the file again
+    with _schemas_lock:
+        _schemas.clear()
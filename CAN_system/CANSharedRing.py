@@ -0,0 +1,168 @@
+# File: CANSharedRing.py
+# This file is part of the OBU project.
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the MIT License
+
+#----------------------------------------------------------------------------
+# Receive path running in a separate process.
+# The receiver process reads the CAN socket and writes fixed-size records
+# (timestamp, arbitration id, DLC, 8 data bytes) into a ring buffer placed in
+# multiprocessing.shared_memory. The control process reads the records in
+# place : no pickling, no can.Message, and no GIL shared with the socket reader.
+#
+# Single producer / single consumer. The header holds the total number of
+# records written; the reader keeps its own position. A reader lapped by the
+# writer skips the overwritten records and counts them as lost.
+# Python has no memory barrier : on ARM the reader may see the header counter
+# before the record, or a record half overwritten. Each record therefore
+# carries its sequence number and a CRC32, checked on the reader's copy.
+#----------------------------------------------------------------------------
+
+import multiprocessing
+import struct
+import zlib
+from multiprocessing import shared_memory
+
+import can
+
+# sequence + 1 (u64), timestamp (f64), arbitration id (u32), dlc (u8), padding, data (8 bytes),
+# then the CRC32 of those bytes (u32)
+RECORD_BODY = struct.Struct('<QdIB3x8s')
+RECORD_CRC = struct.Struct('<I')
+RECORD = struct.Struct('<QdIB3x8sI')
+# records written (u64), capacity (u32)
+HEADER = struct.Struct('<QI')
+HEADER_SIZE = 16
+DEFAULT_CAPACITY = 4096
+# Maximum time the receiver process stays blocked in bus.recv(), bounds stop() latency
+RECV_TIMEOUT = 0.2
+# Delay before reading again a record counted in the header but not complete yet
+RECORD_RETRY = 0.001
+# Only matches an extended id nobody sends : the TX socket of the control process receives nothing
+TX_ONLY_FILTERS = [{"can_id": 0x1FFFFFFF, "can_mask": 0x1FFFFFFF, "extended": True}]
+
+
+class SharedRing:
+    def __init__(self, capacity=DEFAULT_CAPACITY, name=None):
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=HEADER_SIZE + capacity * RECORD.size)
+            HEADER.pack_into(self.shm.buf, 0, 0, capacity)
+            self.owner = True
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            self.owner = False
+        self.name = self.shm.name
+        self.buf = self.shm.buf
+        self.capacity = HEADER.unpack_from(self.buf, 0)[1]
+
+    def written(self):
+        return struct.unpack_from('<Q', self.buf, 0)[0]
+
+    def write(self, timestamp, arbitration_id, dlc, data):
+        sequence = self.written()
+        offset = HEADER_SIZE + (sequence % self.capacity) * RECORD.size
+        body = RECORD_BODY.pack(sequence + 1, timestamp, arbitration_id, dlc, bytes(data))
+        self.buf[offset:offset + RECORD_BODY.size] = body
+        RECORD_CRC.pack_into(self.buf, offset + RECORD_BODY.size, zlib.crc32(body))
+        # Published once the record is written (the reader still checks the record itself)
+        struct.pack_into('<Q', self.buf, 0, sequence + 1)
+
+    def close(self):
+        self.buf = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+class RingReader:
+    def __init__(self, ring: SharedRing):
+        self.ring = ring
+        self.position = ring.written()
+        self.lost = 0
+
+    def _resync(self, written):
+        # Oldest record the writer is not about to overwrite (slot `written` is the next one it fills)
+        oldest = written - self.ring.capacity + 1
+        self.lost += oldest - self.position
+        self.position = oldest
+
+    def behind(self):
+        return self.position < self.ring.written()
+
+    def drain(self, callback):
+        """Calls callback(timestamp, arbitration_id, dlc, data) for every new record. Returns the count."""
+        ring = self.ring
+        written = ring.written()
+        if written - self.position >= ring.capacity:
+            self._resync(written)
+        count = 0
+        while self.position < written:
+            offset = HEADER_SIZE + (self.position % ring.capacity) * RECORD.size
+            record = bytes(ring.buf[offset:offset + RECORD.size])
+            sequence, timestamp, arbitration_id, dlc, data, crc = RECORD.unpack(record)
+            if sequence != self.position + 1 or zlib.crc32(record[:RECORD_BODY.size]) != crc:
+                written = ring.written()
+                if written - self.position >= ring.capacity:
+                    # The slot was overwritten while being read : resynchronise
+                    self._resync(written)
+                    continue
+                # Counted but not visible yet from this core : read again at the next drain
+                break
+            self.position += 1
+            count += 1
+            callback(timestamp, arbitration_id, dlc, data[:dlc])
+        return count
+
+
+def receiver_process_main(ring_name, channel, interface, can_filters, data_ready, stop_event):
+    ring = SharedRing(name=ring_name)
+    bus = can.interface.Bus(channel=channel, interface=interface, receive_own_messages=False,
+                            can_filters=can_filters)
+    try:
+        while not stop_event.is_set():
+            msg = bus.recv(timeout=RECV_TIMEOUT)
+            if msg is not None:
+                ring.write(msg.timestamp, msg.arbitration_id, msg.dlc, msg.data)
+                data_ready.set()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        bus.shutdown()
+        ring.close()
+
+
+class SharedRingReceiver:
+    # Starts the receiver process and reads its ring from the control process
+    def __init__(self, channel, interface, can_filters=None, capacity=DEFAULT_CAPACITY):
+        context = multiprocessing.get_context("spawn")
+        self.ring = SharedRing(capacity)
+        self.reader = RingReader(self.ring)
+        self.data_ready = context.Event()
+        self.stop_event = context.Event()
+        self.process = context.Process(
+            target=receiver_process_main, name=f"CANReceiver-{channel}", daemon=True,
+            args=(self.ring.name, channel, interface, can_filters, self.data_ready, self.stop_event))
+        self.process.start()
+
+    def wait_and_drain(self, callback, timeout=None):
+        # Blocks until the receiver process signals new records, then reads them all
+        self.data_ready.clear()
+        count = self.reader.drain(callback)
+        if count:
+            return count
+        if self.reader.behind():
+            # A record not visible yet : its data_ready was already consumed
+            timeout = RECORD_RETRY if timeout is None else min(timeout, RECORD_RETRY)
+        self.data_ready.wait(timeout)
+        return self.reader.drain(callback)
+
+    def wake(self):
+        self.data_ready.set()
+
+    def stop(self):
+        self.stop_event.set()
+        self.data_ready.set()
+        self.process.join(timeout=2 * RECV_TIMEOUT + 1.0)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.ring.close()
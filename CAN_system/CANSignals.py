@@ -0,0 +1,162 @@
+# File: CANSignals.py
+# This file is part of the OBU project.
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the MIT License
+
+#----------------------------------------------------------------------------
+# Several signals packed into the 8 data bytes of one frame.
+# The layout of an order is declared in the Signals section of can_list.txt :
+#
+#   Signals:
+#   {
+#   steer_status = position:0:10:1:u, enabled:10:1:1:u, out_of_bounds:11:1:1:u
+#   }
+#
+# name:start bit:length in bits:scale:s(igned)|u(nsigned), Intel bit order
+# (start bit 0 = least significant bit of the first byte). The raw value is
+# physical value / scale, rounded. The scale may use an exponent (1e-3).
+# Sending a dict ({"position": 512, "enabled": 1}) packs it with the layout of
+# the order, receiving such an order gives the dict back. Missing signals are
+# sent as 0. Unknown signal names, non-numeric values and values out of range
+# raise ValueError from can_send(), before the frame is queued.
+#
+# Layouts loaded from a DBC file (CANDbc.py) may also use an offset and the
+# Motorola (big-endian) bit order. The decoder of each layout is generated
+# once, as a single expression per signal, when the layout is built.
+#----------------------------------------------------------------------------
+
+import math
+
+
+class Signal:
+    __slots__ = ("name", "start", "length", "scale", "signed", "offset", "little_endian", "unit",
+                 "mask", "minimum", "maximum", "shift")
+
+    def __init__(self, name, start, length, scale=1, signed=False, offset=0, little_endian=True, unit=""):
+        self.name = name
+        self.start = start
+        self.length = length
+        self.scale = scale
+        self.signed = signed
+        self.offset = offset
+        self.little_endian = little_endian
+        self.unit = unit
+        self.mask = (1 << length) - 1
+        self.minimum = -(1 << (length - 1)) if signed else 0
+        self.maximum = (1 << (length - 1)) - 1 if signed else self.mask
+        if little_endian:
+            self.shift = start
+        else:
+            # DBC Motorola : start is the most significant bit (bit 7 of byte 0 = 7),
+            # shift is counted from the least significant bit of the 8 bytes read big-endian
+            self.shift = 64 - ((start // 8) * 8 + (7 - start % 8)) - length
+        if length <= 0 or start < 0 or self.shift < 0 or self.shift + length > 64:
+            raise ValueError(f"Signal '{name}' does not fit in 8 bytes (start={start}, length={length})")
+
+    def bits(self):
+        # Bits used in the frame, numbered as Intel (bit 0 = LSB of byte 0)
+        if self.little_endian:
+            return self.mask << self.start
+        used = 0
+        for bit in range(self.shift, self.shift + self.length):
+            used |= 1 << ((7 - bit // 8) * 8 + bit % 8)
+        return used
+
+    def raw(self, value):
+        try:
+            raw = value - self.offset if self.offset else value
+            raw = round(raw / self.scale) if self.scale != 1 else int(raw)
+        except (TypeError, ValueError):
+            raise ValueError(f"Signal '{self.name}': not a number: {value!r}") from None
+        if not self.minimum <= raw <= self.maximum:
+            low = self.minimum * self.scale + self.offset
+            high = self.maximum * self.scale + self.offset
+            raise ValueError(f"Signal '{self.name}' out of range: {value} (allowed {low} .. {high})")
+        return raw & self.mask
+
+    def expression(self):
+        # Python expression of the physical value, from `le`/`be` (payload read little/big-endian)
+        word = "le" if self.little_endian else "be"
+        expr = f"({word} >> {self.shift}) & {self.mask}" if self.shift else f"{word} & {self.mask}"
+        if self.signed:
+            sign = 1 << (self.length - 1)
+            expr = f"((({expr}) ^ {sign}) - {sign})"
+        if self.scale != 1:
+            expr = f"({expr}) * {self.scale!r}"
+        if self.offset:
+            expr = f"({expr}) + {self.offset!r}"
+        return expr
+
+
+class SignalLayout:
+    def __init__(self, order, signals, size=None):
+        self.order = order
+        self.signals = tuple(signals)
+        used = 0
+        for signal in self.signals:
+            bits = signal.bits()
+            if used & bits:
+                raise ValueError(f"Overlapping signal '{signal.name}' in the layout of '{order}'")
+            used |= bits
+        self.size = size if size is not None else max(1, (used.bit_length() + 7) // 8)
+        self.names = frozenset(signal.name for signal in self.signals)
+        self.unpack = self._compile_unpack()
+
+    def _compile_unpack(self):
+        lines = ["def unpack(data):"]
+        if any(signal.little_endian for signal in self.signals):
+            lines.append("    le = int.from_bytes(data, 'little')")
+        if any(not signal.little_endian for signal in self.signals):
+            lines.append("    be = int.from_bytes(bytes(data).ljust(8, b'\\0'), 'big')")
+        items = ", ".join(f"{signal.name!r}: {signal.expression()}" for signal in self.signals)
+        lines.append(f"    return {{{items}}}")
+        namespace = {}
+        exec(compile("\n".join(lines), f"<signals {self.order}>", "exec"), namespace)
+        return namespace["unpack"]
+
+    def pack(self, values):
+        unknown = values.keys() - self.names
+        if unknown:
+            raise ValueError(f"Unknown signal(s) {sorted(unknown)} for '{self.order}' "
+                             f"(layout: {', '.join(signal.name for signal in self.signals)})")
+        le = be = 0
+        for signal in self.signals:
+            value = values.get(signal.name)
+            if value is not None:
+                try:
+                    raw = signal.raw(value)
+                except ValueError as e:
+                    raise ValueError(f"'{self.order}': {e}") from None
+                if signal.little_endian:
+                    le |= raw << signal.shift
+                else:
+                    be |= raw << signal.shift
+        if not be:
+            return le.to_bytes(self.size, 'little')
+        return (le | int.from_bytes(be.to_bytes(8, 'big'), 'little')).to_bytes(8, 'little')[:self.size]
+
+
+def parse_scale(name, text):
+    # "10", "0.5", "1e-3" ... : an integral scale is kept as an int (exact integer encoding)
+    try:
+        scale = float(text)
+    except ValueError:
+        raise ValueError(f"Signal '{name}': invalid scale '{text}'") from None
+    if scale == 0 or not math.isfinite(scale):
+        raise ValueError(f"Signal '{name}': invalid scale '{text}'")
+    return int(scale) if scale.is_integer() else scale
+
+
+def parse_signal(text):
+    name, start, length, scale, sign = map(str.strip, text.split(':'))
+    if sign not in ("s", "u"):
+        raise ValueError(f"Signal '{name}': signedness must be 's' or 'u', got '{sign}'")
+    return Signal(name, int(start), int(length), parse_scale(name, scale), sign == "s")
+
+
+def parse_layouts(section):
+    # {order: "name:start:length:scale:s|u, ..."} (Signals section) -> {order: SignalLayout}
+    return {
+        order: SignalLayout(order, [parse_signal(item) for item in value.split(',') if item.strip()])
+        for order, value in section.items()
+    }
@@ -6,106 +6,342 @@
 # it under the terms of the MIT License
 
 #----------------------------------------------------------------------------
-# This system uses a FIFO (First In, First Out) queue to handle CAN messages.
-# Messages are processed in the order in which they are received.
+# By default this system uses a FIFO (First In, First Out) queue to handle
+# CAN messages : they are processed in the order in which they are received.
+# queue_policy="priority" or "edf" dispatches them by static priority or by
+# earliest deadline, using the OrderPriority section of can_list.txt.
+# The listening thread blocks on the queue and is only woken up when the
+# Notifier delivers a frame (or when stop() is called), so an idle bus
+# costs no CPU.
+# Orders declared as "state" in can_list.txt (OrderKind) are coalesced into
+# a latest-value slot: at most one frame per such order waits in the queue.
+# Every other order is an event and is delivered exactly once.
 #----------------------------------------------------------------------------
 
 import can
-import re
 import threading
 import queue
+import time
+
+from .CANQueue import RxQueue
+from .CANFrame import FramePool
+from .CANSchema import DEFAULT_ORDER_POLICY, load_schema
+from .CANLatency import LatencyStats, LatencyDumper
+from .CANSharedRing import SharedRingReceiver, TX_ONLY_FILTERS
+from .CANBusHub import CANBusHub
+from .CANTxScheduler import CANTxScheduler
+from .CANTransaction import CANTransactions
+
+# Maximum time the Notifier thread stays blocked in bus.recv(), bounds stop() latency
+NOTIFIER_TIMEOUT = 0.2
+# Maximum number of frames waiting in the receive queue (None = unbounded)
+DEFAULT_QUEUE_CAPACITY = 256
 
 
 class CANManager:
-    def __init__(self, bus, device_name, can_list_path='CAN_system/can_list.txt'):
+    def __init__(self, bus, device_name, can_list_path=None):
+        # can_list_path : None = CAN_system/can_list.txt, or another can_list/DBC file
         self.device_name = device_name
-        self.device_id_map, self.order_id_map, self.device_id_reverse_map, self.order_id_reverse_map = self.load_can_list(can_list_path)
+        # Read-only tables shared by every manager of the process (see CANSchema.py)
+        self.schema = load_schema(can_list_path)
+        self.sections = self.schema.sections
+        self.device_id_map = self.schema.device_id_map
+        self.order_id_map = self.schema.order_id_map
+        self.device_id_reverse_map = self.schema.device_id_reverse_map
+        self.order_id_reverse_map = self.schema.order_id_reverse_map
+        # "state" orders are high-rate signals where only the latest value matters,
+        # every other order is an "event" that must be delivered exactly once
+        self.order_kind_map = self.schema.order_kind_map
+        self.arbitration_id_map = self.schema.arbitration_id_map
+        self.arbitration_id_reverse_map = self.schema.arbitration_id_reverse_map
+        self.state_arbitration_ids = self.schema.state_arbitration_ids
+        # (priority, deadline in seconds) of each order, from the OrderPriority section
+        self.order_policy_map = self.schema.order_policy_map
+        self.arbitration_policy_map = self.schema.arbitration_policy_map
+        self.tx_min_interval_map = self.schema.tx_min_interval_map
+        # Orders carrying several signals in one frame (Signals section, see CANSignals.py)
+        self.signal_layouts = self.schema.signal_layouts
         self.bus = bus
 
-    def load_can_list(self, filename):
-        device_id_map, order_id_map = {}, {}
-        device_id_reverse_map, order_id_reverse_map = {}, {}
+    def order_policy(self, arbitration_id):
+        return self.arbitration_policy_map.get(arbitration_id, DEFAULT_ORDER_POLICY)
 
-        with open(filename, 'r') as file:
-            content = file.read()
+    def can_filters(self):
+        # Acceptance filter keeping only the frames addressed to this device
+        # (device id in the upper bits of the 11-bit identifier)
+        device_value = self.device_id_map.get(self.device_name)
+        if device_value is None:
+            return None
+        return [{"can_id": int(device_value, 16) << 8, "can_mask": 0x700, "extended": False}]
 
-        for section_name, target_map, reverse_map in [
-            ("DeviceID", device_id_map, device_id_reverse_map),
-            ("OrderID", order_id_map, order_id_reverse_map)
-        ]:
-            section = re.search(fr'{section_name}:\s*{{([^}}]*)}}', content)
-            if section:
-                lines = section.group(1).strip().split('\n')
-                for line in lines:
-                    if '=' in line:
-                        key, value = map(str.strip, line.split('='))
-                        target_map[key] = value
-                        reverse_map[value] = key
+    def encode(self, device_id, order_id):
+        try:
+            return self.arbitration_id_map[(device_id, order_id)]
+        except KeyError:
+            raise ValueError("Invalid device_id or order_id") from None
 
-        return device_id_map, order_id_map, device_id_reverse_map, order_id_reverse_map
+    def decode(self, arbitration_id):
+        pair = self.arbitration_id_reverse_map.get(arbitration_id)
+        if pair is not None:
+            return pair
+        # Unknown ids keep the raw hex representation
+        device_hex = hex(arbitration_id >> 8)[2:].zfill(2)
+        order_hex = hex(arbitration_id & 0xFF)[2:].zfill(2)
+        return (self.device_id_reverse_map.get(device_hex, device_hex),
+                self.order_id_reverse_map.get(order_hex, order_hex))
 
-    def can_send(self, device_id, order_id, data=None):
-        device_value = self.device_id_map.get(device_id)
-        order_value = self.order_id_map.get(order_id)
+    @staticmethod
+    def encode_data(data):
+        # Big-endian, without leading zero bytes (0 or None -> empty payload)
+        if not data or data < 0:
+            return b''
+        data = int(data)
+        return data.to_bytes((data.bit_length() + 7) // 8, 'big')
 
-        if device_value is None or order_value is None:
-            raise ValueError("Invalid device_id or order_id")
+    def encode_payload(self, order_id, data):
+        # dict of signals for the orders of the Signals section, integer otherwise
+        if data.__class__ is not dict:
+            # Scalar fast path, same as encode_data() without the extra call
+            if not data or data < 0:
+                return b''
+            data = int(data)
+            return data.to_bytes((data.bit_length() + 7) // 8, 'big')
+        layout = self.signal_layouts.get(order_id)
+        if layout is None:
+            raise ValueError(f"No signal layout declared for '{order_id}'")
+        return layout.pack(data)
 
-        arbitration_id = int(device_value + order_value, 16)
+    def decode_payload(self, order_id, data):
+        layout = self.signal_layouts.get(order_id)
+        if layout is not None:
+            return layout.unpack(data)
+        return int.from_bytes(data, byteorder='big')
 
-        data_bytes = []
-        if data is not None:
-            while data > 0:
-                data_bytes.insert(0, data & 0xFF)
-                data >>= 8
+    def build_message(self, device_id, order_id, data=None):
+        return can.Message(arbitration_id=self.encode(device_id, order_id),
+                           data=self.encode_payload(order_id, data), is_extended_id=False)
 
-        can_message = can.Message(arbitration_id=arbitration_id, data=data_bytes, is_extended_id=False)
-        self.bus.send(can_message)
+    def can_send(self, device_id, order_id, data=None):
+        self.bus.send(self.build_message(device_id, order_id, data))
 
 
 
 class CANReceiver(can.Listener):
-    def __init__(self, manager: CANManager):
+    def __init__(self, manager: CANManager, coalesce=True, queue_policy="fifo",
+                 queue_capacity=DEFAULT_QUEUE_CAPACITY, overflow_policy="drop_oldest"):
         super().__init__()
         self.manager = manager
         self.last_data = {}
-        self.msg_queue = queue.Queue()
+        self.msg_queue = RxQueue(queue_policy, capacity=queue_capacity, overflow=overflow_policy)
+        # Frames discarded because the queue was full, per order
+        self.overflows = {}
+        self.frames_received = 0
+        self.frames_dropped = 0
+        self.frames_coalesced = 0
+        # Latest-value slots of the "state" orders, keyed by arbitration id.
+        # The queue only holds the arbitration id while a slot is pending.
+        self.coalesce = coalesce
+        self.mailboxes = {}
+        self._mailbox_lock = threading.Lock()
+        # Per-order waiting time in the queue : [count, total, max, deadline misses]
+        self.wait_stats = {}
+        # Optional CANLatency.LatencyStats, None when instrumentation is disabled
+        self.latency = None
+        self.last_timestamp = None
+        # Frames are copied into preallocated records (CANFrame.py) : enough for a full
+        # queue, one pending value per mailbox and the frame being dispatched
+        pool_size = (queue_capacity or DEFAULT_QUEUE_CAPACITY) + len(manager.state_arbitration_ids) + 1
+        self.frame_pool = FramePool(pool_size)
 
     def on_message_received(self, msg):
-        self.msg_queue.put(msg)
+        self.frames_received += 1
+        arbitration_id = msg.arbitration_id
+        if self.latency is not None:
+            self.latency.add(self.manager.decode(arbitration_id)[1], "socket", time.time() - msg.timestamp)
+        record = self.frame_pool.acquire(msg)
+        if self.coalesce and arbitration_id in self.manager.state_arbitration_ids:
+            with self._mailbox_lock:
+                previous = self.mailboxes.get(arbitration_id)
+                self.mailboxes[arbitration_id] = record
+            if previous is not None:
+                self.frame_pool.release(previous)
+                self.frames_coalesced += 1
+                return
+            self._put(arbitration_id, arbitration_id)
+        else:
+            self._put(record, arbitration_id)
+
+    def _put(self, item, arbitration_id):
+        now = time.monotonic()
+        priority, deadline = self.manager.order_policy(arbitration_id)
+        dropped = self.msg_queue.put(item, priority, now + deadline, now, key=arbitration_id)
+        if dropped is not None:
+            self._record_overflow(dropped)
+
+    def _record_overflow(self, dropped):
+        if isinstance(dropped, int):
+            # A mailbox reference was discarded : free its slot as well
+            arbitration_id = dropped
+            dropped = self._take_mailbox(arbitration_id)
+        else:
+            arbitration_id = dropped.arbitration_id
+        if dropped is not None:
+            self.frame_pool.release(dropped)
+        _, order = self.manager.decode(arbitration_id)
+        self.overflows[order] = self.overflows.get(order, 0) + 1
 
-    def can_input(self):
+    def _take_mailbox(self, arbitration_id):
+        with self._mailbox_lock:
+            return self.mailboxes.pop(arbitration_id, None)
+
+    def wake(self):
+        # Unblocks a thread waiting in can_input(block=True)
+        self.msg_queue.wake()
+
+    def _record_wait(self, order, enqueued_at, deadline):
+        now = time.monotonic()
+        wait = now - enqueued_at
+        stats = self.wait_stats.get(order)
+        if stats is None:
+            stats = self.wait_stats[order] = [0, 0.0, 0.0, 0]
+        stats[0] += 1
+        stats[1] += wait
+        if wait > stats[2]:
+            stats[2] = wait
+        if now > deadline:
+            stats[3] += 1
+
+    def order_stats(self):
+        return {
+            order: {
+                "count": count,
+                "mean_wait_ms": total / count * 1000.0,
+                "max_wait_ms": max_wait * 1000.0,
+                "deadline_misses": misses,
+            }
+            for order, (count, total, max_wait, misses) in list(self.wait_stats.items())
+        }
+
+    def can_input(self, block=False, timeout=None):
         try:
-            msg = self.msg_queue.get_nowait()
+            entry = self.msg_queue.get(block, timeout)
         except queue.Empty:
             return None
+        if entry is None:
+            return None
+        record, enqueued_at, deadline = entry
+        if isinstance(record, int):
+            record = self._take_mailbox(record)
+            if record is None:
+                return None
 
-        arbitration_id = msg.arbitration_id
-        device_hex = hex(arbitration_id >> 8)[2:].zfill(2)
-        order_hex = hex(arbitration_id & 0xFF)[2:].zfill(2)
-        data = int.from_bytes(msg.data, byteorder='big')
-
-        device = self.manager.device_id_reverse_map.get(device_hex, device_hex)
-        order = self.manager.order_id_reverse_map.get(order_hex, order_hex)
+        device, order = self.manager.decode(record.arbitration_id)
+        self._record_wait(order, enqueued_at, deadline)
+        if self.latency is not None:
+            self.latency.add(order, "queue", time.monotonic() - enqueued_at)
+            self.latency.add_queue_depth(self.msg_queue.qsize())
+        self.last_timestamp = record.timestamp
+        if order in self.manager.signal_layouts:
+            data = self.manager.signal_layouts[order].unpack(record.data[:record.dlc])
+        else:
+            data = record.integer()
+        self.frame_pool.release(record)
         if device == self.manager.device_name:
             return device, order, data
+        self.frames_dropped += 1
         return None
 
 
 
 class CANSystem:
-    def __init__(self,device_name, channel='can0', interface='socketcan', verbose=False):
+    def __init__(self, device_name, channel='can0', interface='socketcan', verbose=False, use_filters=True,
+                 coalesce=True, queue_policy="fifo", queue_capacity=DEFAULT_QUEUE_CAPACITY,
+                 overflow_policy="drop_oldest", instrument=False, latency_dump_period=None, rx_process=False,
+                 shared_bus=False, tx_scheduler=False):
+        # use_filters=False receives every frame of the bus (sniffing tools)
+        # coalesce=False queues every frame, including the "state" orders of can_list.txt
+        # queue_policy : "fifo", "priority" or "edf" (see CANQueue.py)
+        # overflow_policy : "drop_oldest", "drop_newest" or "coalesce" once queue_capacity is reached
+        # instrument=True keeps per-order latency histograms (see CANLatency.py),
+        # printed every latency_dump_period seconds when given
+        # rx_process=True reads the socket in a separate process through a shared memory
+        # ring (see CANSharedRing.py) : frames are dispatched in arrival order, without queue policy
+        # shared_bus=True uses the socket and RX thread of the process-wide hub of the channel
+        # (see CANBusHub.py) instead of opening its own
+        # tx_scheduler=True makes can_send() non-blocking : frames are sent by a dedicated thread,
+        # by priority, rate limited and coalesced (see CANTxScheduler.py)
+        if rx_process and shared_bus:
+            raise ValueError("CANSystem: rx_process and shared_bus cannot be combined")
         self.device_name = device_name
         self.verbose = verbose
-        self.bus = can.interface.Bus(channel=channel, interface=interface, receive_own_messages=False)
-        self.can_manager = CANManager(bus=self.bus, device_name=self.device_name)
-        self.listener = CANReceiver(self.can_manager)
-        self.notifier = can.Notifier(self.bus, [self.listener])
+        self.channel = channel
+        self.can_manager = CANManager(bus=None, device_name=self.device_name)
+        self.can_filters = self.can_manager.can_filters() if use_filters else None
+        if self.verbose:
+            print(f"CANSystem: acceptance filters = {self.can_filters}")
+        self._rx_packets_start = self._interface_rx_packets()
+        self.listener = CANReceiver(self.can_manager, coalesce=coalesce, queue_policy=queue_policy,
+                                    queue_capacity=queue_capacity, overflow_policy=overflow_policy)
+        self.rx_ring = None
+        self.notifier = None
+        self.hub = None
+        if shared_bus:
+            self.hub = CANBusHub.acquire(channel, interface, verbose)
+            self.bus = self.hub.bus
+            self._hub_device = self._device_value() if self.can_filters is not None else None
+            self._hub_listeners = [self.listener]
+            self._hub_frames_start = self.hub.frames_received
+            self.hub.attach(self._hub_device, self.listener)
+        elif rx_process:
+            # This socket is only used to send, the receiver process owns the receive path
+            self.bus = can.interface.Bus(channel=channel, interface=interface, receive_own_messages=False,
+                                         can_filters=TX_ONLY_FILTERS)
+            self.rx_ring = SharedRingReceiver(channel, interface, self.can_filters)
+        else:
+            self.bus = can.interface.Bus(channel=channel, interface=interface, receive_own_messages=False,
+                                         can_filters=self.can_filters)
+            self.notifier = can.Notifier(self.bus, [self.listener], timeout=NOTIFIER_TIMEOUT)
+        self.can_manager.bus = self.bus
+        self.tx = None
+        if tx_scheduler:
+            self.tx = CANTxScheduler(self.can_manager, self.bus, verbose=verbose)
+            self.tx.start()
         self.running = False
         self.callback = None
+        # request()/expect() : futures resolved by the received frames (see CANTransaction.py)
+        self.transactions = CANTransactions(self.can_send, verbose=verbose)
+        self.cyclic_tasks = {}
+        self.latency = None
+        self.latency_dumper = None
+        if instrument:
+            self.enable_latency(latency_dump_period)
+
+    def _device_value(self):
+        device_value = self.can_manager.device_id_map.get(self.device_name)
+        return None if device_value is None else int(device_value, 16)
 
     def set_callback(self, callback_fn):
         self.callback = callback_fn
+
+    def add_listener(self, listener):
+        # Extra can.Listener receiving every frame seen by this system (recorder, monitor, ...)
+        if self.hub is not None:
+            # Sees the same frames as this system
+            self.hub.attach(self._hub_device, listener)
+            self._hub_listeners.append(listener)
+            return
+        if self.notifier is None:
+            raise RuntimeError("CANSystem: listeners are not available with rx_process=True")
+        self.notifier.add_listener(listener)
+
+    def remove_listener(self, listener):
+        if self.hub is not None:
+            self.hub.detach(listener)
+            self._hub_listeners.remove(listener)
+            return
+        if self.notifier is None:
+            raise RuntimeError("CANSystem: listeners are not available with rx_process=True")
+        self.notifier.remove_listener(listener)
     
     def start_listening(self):
         print("start_listen")
@@ -115,23 +351,169 @@ class CANSystem:
         self.running = True
 
         def listen_loop():
-            previous_msg = None
             while self.running:
-                msg = self.listener.can_input()
-                if msg and isinstance(msg, tuple) and len(msg) == 3 and msg != previous_msg:
-                    previous_msg = msg
+                # Blocks until the Notifier queues a frame or stop() wakes us up
+                msg = self.listener.can_input(block=True)
+                if msg:
+                    self.transactions.on_message(*msg)
                     if self.callback:
-                        self.callback(*msg)
+                        if self.latency is None:
+                            self.callback(*msg)
+                        else:
+                            self._timed_callback(msg)
+
+        def ring_loop():
+            while self.running:
+                # Blocks until the receiver process signals new records or stop() wakes us up
+                self.rx_ring.wait_and_drain(self._on_ring_record)
 
-        self.listen_thread = threading.Thread(target=listen_loop)
+        self.listen_thread = threading.Thread(target=listen_loop if self.rx_ring is None else ring_loop,
+                                              name=f"CANSystem-{self.device_name}")
         self.listen_thread.start()
 
+    def _on_ring_record(self, timestamp, arbitration_id, dlc, data):
+        self.listener.frames_received += 1
+        device, order = self.can_manager.decode(arbitration_id)
+        if device != self.device_name:
+            self.listener.frames_dropped += 1
+            return
+        data = self.can_manager.decode_payload(order, data)
+        self.transactions.on_message(device, order, data)
+        if self.callback:
+            self.callback(device, order, data)
+
+    def _timed_callback(self, msg):
+        start = time.perf_counter()
+        self.callback(*msg)
+        order = msg[1]
+        self.latency.add(order, "handler", time.perf_counter() - start)
+        if self.listener.last_timestamp:
+            self.latency.add(order, "total", time.time() - self.listener.last_timestamp)
+
+    def enable_latency(self, dump_period=None):
+        self.latency = LatencyStats()
+        self.listener.latency = self.latency
+        if dump_period:
+            self.latency_dumper = LatencyDumper(self.latency, dump_period)
+            self.latency_dumper.start()
+
+    def latency_stats(self):
+        # Per-order p50/p99/max of each stage of the receive path, in ms
+        if self.latency is None:
+            return {}
+        return self.latency.snapshot()
+
+    def order_stats(self):
+        # Queueing time and deadline misses per order, to spot starvation
+        return self.listener.order_stats()
+
+    def overflow_stats(self):
+        # Frames discarded per order because the receive queue was full
+        return dict(self.listener.overflows)
+
+    def queue_depth(self):
+        return self.listener.msg_queue.qsize()
+
+    def _interface_rx_packets(self):
+        # Frames seen by the network interface (socketcan only)
+        try:
+            with open(f"/sys/class/net/{self.channel}/statistics/rx_packets") as f:
+                return int(f.read())
+        except (OSError, ValueError):
+            return None
+
+    def filter_stats(self):
+        """
+        Frames counters of the receive path :
+        - received : frames delivered to user space
+        - dropped : frames delivered but addressed to another device
+        - filtered : frames rejected by the acceptance filters, i.e. never
+          copied into Python (None when the interface counters are not available)
+        - coalesced : "state" frames replaced by a newer value before dispatch
+        - lost : records overwritten in the shared ring before being read (rx_process=True)
+        """
+        received = self.listener.frames_received
+        filtered = None
+        rx_packets = self._interface_rx_packets()
+        if rx_packets is not None and self._rx_packets_start is not None:
+            # On a shared socket the frames of the other devices were not filtered out
+            delivered = (self.hub.frames_received - self._hub_frames_start) if self.hub is not None else received
+            filtered = max(0, rx_packets - self._rx_packets_start - delivered)
+        return {"received": received, "dropped": self.listener.frames_dropped, "filtered": filtered,
+                "coalesced": self.listener.frames_coalesced,
+                "lost": self.rx_ring.reader.lost if self.rx_ring is not None else 0}
+
+    def request(self, device_id, order_id, data=None, ack_order="ready_ack", timeout=5.0, **retry):
+        """
+        Sends device_id/order_id, retransmitted with backoff until ack_order is received.
+        Returns a concurrent.futures.Future of the ack data (TimeoutError after `timeout`).
+        """
+        return self.transactions.request(device_id, order_id, data, ack_order=ack_order, timeout=timeout,
+                                         **retry)
+
+    def expect(self, order_id, timeout=None):
+        """Future resolved with the data of the next order_id received by this device."""
+        return self.transactions.expect(order_id, timeout=timeout)
+
+    def tx_stats(self):
+        # Counters of the transmit scheduler, {} when it is disabled
+        if self.tx is None:
+            return {}
+        return self.tx.stats()
+
+    def start_cyclic(self, device_id, order_id, data, period):
+        """
+        Registers a message sent every `period` seconds by the bus itself
+        (SocketCAN BCM in the kernel), without any Python wake-up.
+        The payload is then changed in place with update_cyclic().
+        """
+        key = (device_id, order_id)
+        self.stop_cyclic(device_id, order_id)
+        msg = self.can_manager.build_message(device_id, order_id, data)
+        self.cyclic_tasks[key] = self.bus.send_periodic(msg, period)
+        if self.verbose:
+            print(f"CANSystem: cyclic {device_id}/{order_id} every {period * 1000:.0f} ms")
+        return self.cyclic_tasks[key]
+
+    def update_cyclic(self, device_id, order_id, data):
+        task = self.cyclic_tasks.get((device_id, order_id))
+        if task is None:
+            raise ValueError(f"No cyclic task registered for {device_id}/{order_id}")
+        task.modify_data(self.can_manager.build_message(device_id, order_id, data))
+
+    def stop_cyclic(self, device_id, order_id):
+        task = self.cyclic_tasks.pop((device_id, order_id), None)
+        if task is not None:
+            task.stop()
+
     def stop(self):
+        for device_id, order_id in list(self.cyclic_tasks):
+            self.stop_cyclic(device_id, order_id)
         self.running = False
-        if hasattr(self, "listen_thread"):
+        self.transactions.close()
+        if self.latency_dumper is not None:
+            self.latency_dumper.stop()
+        self.listener.wake()
+        if self.rx_ring is not None:
+            self.rx_ring.wake()
+        if hasattr(self, "listen_thread") and self.listen_thread is not threading.current_thread():
             self.listen_thread.join()
+        if self.tx is not None:
+            self.tx.stop()
+        if self.hub is not None:
+            for listener in self._hub_listeners:
+                self.hub.detach(listener)
+            self.hub.release()
+            return
+        if self.notifier is not None:
+            self.notifier.stop()
+        if self.rx_ring is not None:
+            self.rx_ring.stop()
         self.bus.shutdown()
 
 
     def can_send(self, id_, sub_id, data=None):
-        self.can_manager.can_send(id_, sub_id, data)
+        if self.tx is not None:
+            self.tx.submit(id_, sub_id, data)
+        else:
+            self.can_manager.can_send(id_, sub_id, data)
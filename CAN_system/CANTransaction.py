@@ -0,0 +1,181 @@
+# File: CANTransaction.py
+# This file is part of the OBU project.
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the MIT License
+
+#----------------------------------------------------------------------------
+# Request / acknowledgement transactions over CAN.
+# request() sends a frame and returns a concurrent.futures.Future resolved
+# with the data of the first acknowledgement received (e.g. steer_rdy ->
+# ready_ack). Until then the request is sent again with an exponential
+# backoff (RETRY_INITIAL, x RETRY_BACKOFF, at most RETRY_MAX); once the
+# timeout is reached the future fails with TimeoutError.
+# expect() only waits for the next reception of an order, without sending.
+# Any number of transactions can be outstanding at once; a single timer
+# thread handles all retransmissions and timeouts.
+#
+#   future = can_system.request("OBU", "steer_rdy", 1, ack_order="ready_ack", timeout=20)
+#   future.result()  # data of the ack, raises TimeoutError
+#----------------------------------------------------------------------------
+
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import Future, InvalidStateError
+
+RETRY_INITIAL = 0.05
+RETRY_BACKOFF = 2.0
+RETRY_MAX = 0.5
+
+
+class _Transaction:
+    __slots__ = ("request", "ack_order", "future", "deadline", "interval", "backoff", "max_interval", "sends")
+
+    def __init__(self, request, ack_order, timeout, interval=None, backoff=None, max_interval=None):
+        self.request = request  # (device, order, data), None for expect()
+        self.ack_order = ack_order
+        self.future = Future()
+        self.deadline = time.monotonic() + timeout if timeout is not None else None
+        self.interval = interval
+        self.backoff = backoff
+        self.max_interval = max_interval
+        self.sends = 0
+
+
+class CANTransactions:
+    def __init__(self, send, verbose=False):
+        # send(device, order, data) : CANSystem.can_send
+        self.send = send
+        self.verbose = verbose
+        self._waiting = {}  # ack order -> list of _Transaction
+        self._timers = []   # heap of (monotonic time, seq, _Transaction)
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._thread = None
+        self._closed = False
+
+    def _print(self, *args, **kwargs):
+        if self.verbose:
+            print("[CANTransactions]", *args, **kwargs)
+
+    def request(self, device_id, order_id, data=None, ack_order="ready_ack", timeout=5.0,
+                retry=RETRY_INITIAL, backoff=RETRY_BACKOFF, max_retry=RETRY_MAX):
+        """Sends device_id/order_id until ack_order is received. Returns a Future of the ack data."""
+        transaction = _Transaction((device_id, order_id, data), ack_order, timeout, retry, backoff, max_retry)
+        self._register(transaction)
+        self._send(transaction)
+        return transaction.future
+
+    def expect(self, order, timeout=None):
+        """Future resolved with the data of the next `order` received."""
+        transaction = _Transaction(None, order, timeout)
+        self._register(transaction)
+        return transaction.future
+
+    def _register(self, transaction):
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("CANTransactions: closed")
+            self._waiting.setdefault(transaction.ack_order, []).append(transaction)
+            first_timer = self._first_timer(transaction)
+            if first_timer is not None:
+                heapq.heappush(self._timers, (first_timer, next(self._seq), transaction))
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._timer_loop, name="CANTransactions",
+                                                    daemon=True)
+                    self._thread.start()
+                self._cond.notify()
+
+    @staticmethod
+    def _first_timer(transaction):
+        if transaction.request is None:
+            return transaction.deadline
+        retry_at = time.monotonic() + transaction.interval
+        if transaction.deadline is None:
+            return retry_at
+        return min(retry_at, transaction.deadline)
+
+    def _send(self, transaction):
+        transaction.sends += 1
+        try:
+            self.send(*transaction.request)
+        except Exception as e:
+            # Sent again at the next retry
+            self._print(f"send {transaction.request[1]} failed: {e}")
+
+    def on_message(self, device, order, data):
+        # Called for every received frame, before the user callback
+        if order not in self._waiting:
+            return
+        with self._cond:
+            transactions = self._waiting.pop(order, ())
+        for transaction in transactions:
+            self._resolve(transaction.future, data)
+
+    @staticmethod
+    def _resolve(future, data=None, exception=None):
+        # The future may have been cancelled by close() in the meantime
+        try:
+            if exception is not None:
+                future.set_exception(exception)
+            else:
+                future.set_result(data)
+        except InvalidStateError:
+            pass
+
+    def _timer_loop(self):
+        while True:
+            with self._cond:
+                while True:
+                    if self._closed:
+                        return
+                    # Transactions resolved since they were scheduled
+                    while self._timers and self._timers[0][2].future.done():
+                        heapq.heappop(self._timers)
+                    now = time.monotonic()
+                    if self._timers and self._timers[0][0] <= now:
+                        _, _, transaction = heapq.heappop(self._timers)
+                        break
+                    self._cond.wait(self._timers[0][0] - now if self._timers else None)
+                if transaction.deadline is not None and now >= transaction.deadline:
+                    self._discard(transaction)
+                    timed_out = True
+                else:
+                    timed_out = False
+                    transaction.interval = min(transaction.interval * transaction.backoff,
+                                               transaction.max_interval)
+                    heapq.heappush(self._timers, (self._next_timer(transaction, now), next(self._seq), transaction))
+            if timed_out:
+                what = transaction.request[1] if transaction.request else "expect"
+                self._resolve(transaction.future, exception=TimeoutError(
+                    f"{what}: no {transaction.ack_order} after {transaction.sends} sends"))
+            else:
+                self._send(transaction)
+
+    @staticmethod
+    def _next_timer(transaction, now):
+        retry_at = now + transaction.interval
+        return retry_at if transaction.deadline is None else min(retry_at, transaction.deadline)
+
+    def _discard(self, transaction):
+        transactions = self._waiting.get(transaction.ack_order)
+        if transactions and transaction in transactions:
+            transactions.remove(transaction)
+            if not transactions:
+                del self._waiting[transaction.ack_order]
+
+    def pending(self):
+        with self._cond:
+            return sum(len(transactions) for transactions in self._waiting.values())
+
+    def close(self):
+        # Cancels every outstanding transaction
+        with self._cond:
+            self._closed = True
+            transactions = [t for waiting in self._waiting.values() for t in waiting]
+            self._waiting.clear()
+            self._timers.clear()
+            self._cond.notify()
+        for transaction in transactions:
+            transaction.future.cancel()
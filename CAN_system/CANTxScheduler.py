@@ -0,0 +1,200 @@
+# File: CANTxScheduler.py
+# This file is part of the OBU project.
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the MIT License
+
+#----------------------------------------------------------------------------
+# Transmit scheduler of CANSystem (tx_scheduler=True).
+# can_send() only queues the frame and returns : a single thread owns the
+# writes to the socket, so control threads never block on it and never see
+# its errors.
+# - priority : frames leave in the order of the priority of their order
+#   (OrderPriority of can_list.txt), FIFO inside a priority
+# - rate limit : an order listed in TxMinInterval is not sent more often than
+#   its interval, the frame waits until it is allowed
+# - coalescing : "state" and "setpoint" orders (OrderKind) keep only their
+#   latest value while waiting, a burst of updates gives a single frame
+# - retry : a send failing with can.CanOperationError (full socket buffer,
+#   bus-off, ...) is retried after TX_RETRY_DELAY, up to TX_MAX_RETRIES times
+# Events (start, stop, ready, ...) are never coalesced.
+# The payload is encoded by submit(), on the caller's thread : an invalid
+# value raises there and is never queued. Any other error of the thread is
+# counted as a failed frame, the thread keeps running.
+# After stop(), submit() raises can.CanOperationError, as a send on a closed bus.
+#----------------------------------------------------------------------------
+
+import itertools
+import threading
+import time
+
+import can
+
+TX_CAPACITY = 64
+TX_RETRY_DELAY = 0.005
+TX_MAX_RETRIES = 20
+# Time given to stop() to send the frames still waiting
+TX_FLUSH_TIMEOUT = 0.5
+
+
+class _TxEntry:
+    __slots__ = ("priority", "seq", "arbitration_id", "order", "payload", "retries")
+
+    def __init__(self, priority, seq, arbitration_id, order, payload):
+        self.priority = priority
+        self.seq = seq
+        self.arbitration_id = arbitration_id
+        self.order = order
+        self.payload = payload  # encoded data bytes
+        self.retries = 0
+
+
+class CANTxScheduler(threading.Thread):
+    def __init__(self, manager, bus, capacity=TX_CAPACITY, verbose=False):
+        super().__init__(name=f"CANTx-{manager.device_name}", daemon=True)
+        self.manager = manager
+        self.bus = bus
+        self.capacity = capacity
+        self.verbose = verbose
+        self.min_intervals = manager.tx_min_interval_map
+        self.coalesced_orders = frozenset(
+            order for order, kind in manager.order_kind_map.items() if kind in ("state", "setpoint")
+        )
+        self._pending = []   # _TxEntry, small : scanned on every send
+        self._latest = {}    # arbitration id -> pending entry of a coalesced order
+        self._next_allowed = {}  # arbitration id -> monotonic time of the next allowed send
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._closing = False
+        self.counters = {"submitted": 0, "sent": 0, "coalesced": 0, "rate_limited": 0,
+                         "retries": 0, "failed": 0, "dropped": 0}
+        self.sent_per_order = {}
+
+    def _print(self, *args, **kwargs):
+        if self.verbose:
+            print("[CANTxScheduler]", *args, **kwargs)
+
+    def submit(self, device_id, order_id, data=None):
+        # Raises ValueError for an unknown device/order or an invalid payload, as CANManager.can_send(),
+        # and can.CanOperationError once stopped : the thread would never send the frame
+        arbitration_id = self.manager.encode(device_id, order_id)
+        payload = self.manager.encode_payload(order_id, data)
+        with self._cond:
+            if self._closing:
+                raise can.CanOperationError(f"CANTxScheduler: stopped, {order_id} not sent")
+            self.counters["submitted"] += 1
+            entry = self._latest.get(arbitration_id)
+            if entry is not None:
+                # Replaces the waiting value, keeps its place
+                entry.payload = payload
+                self.counters["coalesced"] += 1
+                return
+            if len(self._pending) >= self.capacity:
+                self._drop_oldest()
+            if self._next_allowed.get(arbitration_id, 0.0) > time.monotonic():
+                self.counters["rate_limited"] += 1
+            priority = self.manager.order_policy(arbitration_id)[0]
+            entry = _TxEntry(priority, next(self._seq), arbitration_id, order_id, payload)
+            self._pending.append(entry)
+            if order_id in self.coalesced_orders:
+                self._latest[arbitration_id] = entry
+            self._cond.notify()
+
+    def _drop_oldest(self):
+        oldest = min(self._pending, key=lambda entry: entry.seq)
+        self._remove(oldest)
+        self.counters["dropped"] += 1
+        self._print(f"queue full, {oldest.order} dropped")
+
+    def _remove(self, entry):
+        self._pending.remove(entry)
+        if self._latest.get(entry.arbitration_id) is entry:
+            del self._latest[entry.arbitration_id]
+
+    def _next_entry(self, now):
+        # (entry ready to be sent or None, time until the next rate limited entry is allowed)
+        best = None
+        wait = None
+        for entry in self._pending:
+            allowed = self._next_allowed.get(entry.arbitration_id, 0.0)
+            if allowed > now:
+                if wait is None or allowed - now < wait:
+                    wait = allowed - now
+                continue
+            if best is None or (entry.priority, entry.seq) < (best.priority, best.seq):
+                best = entry
+        return best, wait
+
+    def run(self):
+        flush_deadline = None
+        while True:
+            with self._cond:
+                while True:
+                    now = time.monotonic()
+                    if self._closing:
+                        if flush_deadline is None:
+                            flush_deadline = now + TX_FLUSH_TIMEOUT
+                        if not self._pending or now >= flush_deadline:
+                            return
+                    entry, wait = self._next_entry(now)
+                    if entry is not None:
+                        break
+                    if self._closing:
+                        wait = min(wait if wait is not None else TX_FLUSH_TIMEOUT, flush_deadline - now)
+                    self._cond.wait(wait)
+                self._remove(entry)
+            try:
+                msg = can.Message(arbitration_id=entry.arbitration_id, data=entry.payload, is_extended_id=False)
+                self._send(entry, msg)
+            except Exception as e:
+                # Never lets the thread die : later frames must still be sent
+                with self._cond:
+                    self.counters["failed"] += 1
+                print(f"[CANTxScheduler] ERROR: {entry.order} not sent: {e!r}")
+
+    def _send(self, entry, msg):
+        try:
+            self.bus.send(msg, timeout=0)
+        except can.CanOperationError as e:
+            entry.retries += 1
+            with self._cond:
+                self.counters["retries"] += 1
+                if entry.retries > TX_MAX_RETRIES:
+                    self.counters["failed"] += 1
+                    self._print(f"{entry.order} not sent after {TX_MAX_RETRIES} retries: {e}")
+                    return
+                # Back in the queue unless a newer value of the same order arrived meanwhile
+                if entry.order not in self.coalesced_orders or entry.arbitration_id not in self._latest:
+                    self._pending.append(entry)
+                    if entry.order in self.coalesced_orders:
+                        self._latest[entry.arbitration_id] = entry
+                self._next_allowed[entry.arbitration_id] = time.monotonic() + TX_RETRY_DELAY
+            return
+        interval = self.min_intervals.get(entry.order)
+        with self._cond:
+            # stats() and submit() read these under the same lock
+            self.counters["sent"] += 1
+            self.sent_per_order[entry.order] = self.sent_per_order.get(entry.order, 0) + 1
+            if interval:
+                self._next_allowed[entry.arbitration_id] = time.monotonic() + interval
+            elif entry.retries:
+                self._next_allowed.pop(entry.arbitration_id, None)
+
+    def pending(self):
+        with self._cond:
+            return len(self._pending)
+
+    def stats(self):
+        """Counters of the scheduler and frames sent per order."""
+        with self._cond:
+            stats = dict(self.counters)
+            stats["pending"] = len(self._pending)
+            stats["sent_per_order"] = dict(self.sent_per_order)
+        return stats
+
+    def stop(self):
+        # Sends what is still waiting (at most TX_FLUSH_TIMEOUT) then stops the thread
+        with self._cond:
+            self._closing = True
+            self._cond.notify()
+        if self.is_alive() and self is not threading.current_thread():
+            self.join()
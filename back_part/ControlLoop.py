@@ -0,0 +1,94 @@
+# back_part/ControlLoop.py
+import collections
+import threading
+import time
+
+from CAN_system.CANLatency import percentile
+
+DEFAULT_RATE_HZ = 100.0
+SAMPLES = 2048
+
+
+class ControlLoop(threading.Thread):
+    """
+    Boucle de contrôle à fréquence fixe de l'OBU.
+    - Les échéances sont calculées sur time.monotonic() à partir du départ
+      (t0 + n * période) : pas de dérive comme avec sleep(période).
+    - Chaque tick appelle les tâches dans l'ordre : tasks = [(nom, fonction), ...]
+    - Un tick qui finit après l'échéance suivante est un dépassement (overrun),
+      les ticks sautés sont comptés (missed) et la boucle se recale sans rafale.
+    - stats() : gigue de réveil et durée d'exécution (p50/p99/max en ms).
+    """
+    def __init__(self, tasks, rate_hz=DEFAULT_RATE_HZ, name="OBU-control", verbose=False):
+        super().__init__(name=name, daemon=True)
+        if rate_hz <= 0:
+            raise ValueError(f"rate_hz must be > 0, got {rate_hz}")
+        self.tasks = list(tasks)
+        self.rate_hz = rate_hz
+        self.period = 1.0 / rate_hz
+        self.verbose = verbose
+        self._stop_evt = threading.Event()
+
+        self.ticks = 0
+        self.overruns = 0
+        self.missed = 0
+        self.errors = {}  # nom de tâche -> nombre d'exceptions
+        self._jitter = collections.deque(maxlen=SAMPLES)    # retard du réveil (s)
+        self._duration = collections.deque(maxlen=SAMPLES)  # durée du tick (s)
+
+    def _print(self, *args, **kwargs):
+        if self.verbose:
+            print("[ControlLoop]", *args, **kwargs)
+
+    def run(self):
+        period = self.period
+        deadline = time.monotonic()
+        while not self._stop_evt.is_set():
+            start = time.monotonic()
+            self._jitter.append(start - deadline)
+            for name, task in self.tasks:
+                try:
+                    task()
+                except Exception as e:
+                    self.errors[name] = self.errors.get(name, 0) + 1
+                    self._print(f"task {name} failed: {e}")
+            end = time.monotonic()
+            self._duration.append(end - start)
+            self.ticks += 1
+
+            deadline += period
+            if end > deadline:
+                # Dépassement : on saute les échéances passées au lieu de les rattraper
+                self.overruns += 1
+                skipped = int((end - deadline) / period) + 1
+                self.missed += skipped
+                deadline += skipped * period
+            self._stop_evt.wait(deadline - time.monotonic())
+
+    def stats(self):
+        result = {"rate_hz": self.rate_hz, "ticks": self.ticks, "overruns": self.overruns,
+                  "missed": self.missed, "errors": dict(self.errors)}
+        for key, samples in (("jitter", self._jitter), ("duration", self._duration)):
+            values = sorted(samples)
+            if values:
+                result[key] = {"p50_ms": percentile(values, 0.50) * 1000.0,
+                               "p99_ms": percentile(values, 0.99) * 1000.0,
+                               "max_ms": values[-1] * 1000.0}
+        return result
+
+    def format(self):
+        stats = self.stats()
+        parts = [f"{stats['rate_hz']:.0f} Hz ticks={stats['ticks']} overruns={stats['overruns']} "
+                 f"missed={stats['missed']}"]
+        for key in ("jitter", "duration"):
+            if key in stats:
+                parts.append(f"{key} p50={stats[key]['p50_ms']:.3f} p99={stats[key]['p99_ms']:.3f} "
+                             f"max={stats[key]['max_ms']:.3f} ms")
+        if stats["errors"]:
+            parts.append(f"errors={stats['errors']}")
+        return " | ".join(parts)
+
+    def stop(self):
+        self._stop_evt.set()
+        if self.is_alive() and self is not threading.current_thread():
+            self.join()
@@ -1,62 +1,259 @@
+import collections
+import threading
 import time
-from .MotorController import MotorController
+from concurrent.futures import ThreadPoolExecutor
+
+from CAN_system.CANLatency import percentile
+from .MotorController import MotorController, TORQUE_DEADBAND
+
+# 2 UART différents (à adapter)
+MOTORS = (
+    ("m1", dict(node=1, stoPin=16, uart_port="/dev/ttyAMA0")),
+    ("m2", dict(node=2, stoPin=26, uart_port="/dev/ttyAMA3")),
+)
+# Attente max de l'autre moteur avant d'appliquer une commande (s) : au-delà,
+# le moteur prêt applique sans attendre et le retard est compté (release_timeouts)
+RELEASE_TIMEOUT = 0.003
+# Attente max de la fin d'une commande synchrone (set_direction, stop_motor...) (s)
+COMMAND_TIMEOUT = 2.0
+SKEW_SAMPLES = 1024
 
 class DualMotorController:
-    def __init__(self, verbose=False):
+    def __init__(self, verbose=False, torque_deadband=TORQUE_DEADBAND):
         self.verbose = verbose
 
         self.m1 = None
         self.m2 = None
+        # Durée totale de chaque phase (s) : connect, configure
+        self.startup_times = {}
 
-        # 2 UART différents (à adapter)
-        try:
-            self.m1 = MotorController(node=1, stoPin=16, uart_port="/dev/ttyAMA0", verbose=verbose)
-        except Exception as e:
-            self._print("ERROR init m1:", e)
-
-        try:
-            self.m2 = MotorController(node=2, stoPin=26, uart_port="/dev/ttyAMA3", verbose=verbose)
-        except Exception as e:
-            self._print("ERROR init m2:", e)
+        # Les deux SOLO sont sur des UART séparés : connexion en parallèle,
+        # le démarrage dure max(m1, m2) au lieu de m1 + m2
+        start = time.monotonic()
+        with ThreadPoolExecutor(max_workers=len(MOTORS), thread_name_prefix="motor-init") as pool:
+            futures = {name: pool.submit(MotorController, verbose=verbose, torque_deadband=torque_deadband,
+                                         **params)
+                       for name, params in MOTORS}
+        for name, future in futures.items():
+            try:
+                setattr(self, name, future.result())
+            except Exception as e:
+                self._print(f"ERROR init {name}:", e)
+        self.startup_times["connect"] = time.monotonic() - start
 
         if self.m1 is None and self.m2 is None:
             raise RuntimeError("No motor could be initialized (m1 and m2 failed).")
 
+        # Un worker par moteur : les commandes sont appliquées aux deux UART en même temps
+        for motor in self._motors():
+            motor.start_worker()
+        self._dispatch_lock = threading.Lock()
+        self._skews = collections.deque(maxlen=SKEW_SAMPLES)  # décalage gauche/droite (s)
+        self.release_timeouts = 0  # commandes où un moteur n'était pas prêt à temps
+        # Dernière consigne de couple postée (flush())
+        self._torque_command = None
+        self.torque_commands = 0
+        self._closed = False
+
     def _print(self, *args, **kwargs):
         if self.verbose:
             print("[DualMotorController]", *args, **kwargs)
 
+    def _motors(self):
+        return [motor for motor in (self.m1, self.m2) if motor]
+
     def configure(self):
-        """Configuration minimale (pas de calibration)."""
+        """Configuration minimale (pas de calibration), les deux moteurs en parallèle."""
         self._print("configure()")
-        if self.m1: self.m1.configure()
-        if self.m2: self.m2.configure()
+        start = time.monotonic()
+        motors = self._motors()
+        with ThreadPoolExecutor(max_workers=len(motors), thread_name_prefix="motor-config") as pool:
+            futures = [pool.submit(motor.configure) for motor in motors]
+        for future in futures:
+            future.result()  # relève l'erreur d'un moteur, une fois les deux terminés
+        self.startup_times["configure"] = time.monotonic() - start
+        self._print(self.startup_report())
+
+    def startup_report(self):
+        """Durée des phases du démarrage, au total et par moteur."""
+        parts = []
+        for phase, total in self.startup_times.items():
+            detail = ", ".join(f"m{motor.node} {motor.timings[phase]:.2f}"
+                               for motor in self._motors() if phase in motor.timings)
+            parts.append(f"{phase} {total:.2f} s ({detail})")
+        return "startup: " + " | ".join(parts)
+
+    # ---------- COMMANDES SIMULTANÉES ----------
+    def _post(self, method, m1_args, m2_args, torque=False):
+        calls = {}
+        if self.m1: calls[self.m1] = (method, m1_args)
+        if self.m2: calls[self.m2] = (method, m2_args)
+        command = _Command(calls, self._record_skew)
+        # Même ordre de commandes dans chaque file : sinon les barrières se croisent.
+        # Une consigne de couple remplace celle qui attend encore dans la boîte de
+        # chaque moteur (MotorController.post_torque()).
+        for motor in calls:
+            if torque:
+                motor.post_torque(command)
+            else:
+                motor.post(command)
+        return command
+
+    def _check_open(self):
+        if self._closed:
+            raise RuntimeError("DualMotorController is closed")
+
+    def _apply(self, method, m1_args, m2_args):
+        """
+        Applique method(*args) aux deux moteurs en parallèle (un worker par UART)
+        et attend la fin des deux (COMMAND_TIMEOUT au plus). Relève la première erreur.
+        """
+        with self._dispatch_lock:
+            self._check_open()
+            command = self._post(method, m1_args, m2_args)
+        if not command.finished.wait(COMMAND_TIMEOUT):
+            raise TimeoutError(f"{method} not applied within {COMMAND_TIMEOUT} s")
+        if command.errors:
+            raise command.errors[0]
+
+    def _record_skew(self, command):
+        # Un moteur qui a remplacé la commande par une plus récente n'est pas en retard
+        if command.release_missed and not command.dropped:
+            self.release_timeouts += 1
+            self._print(f"WARN: motor late for {command.method}, applied without waiting")
+        if len(command.applied) > 1:
+            self._skews.append(command.skew())
+
+    def skew_stats(self):
+        """Décalage gauche/droite de l'application des commandes (ms)."""
+        values = sorted(self._skews)
+        if not values:
+            return {"commands": 0, "release_timeouts": self.release_timeouts}
+        return {"commands": len(values), "release_timeouts": self.release_timeouts,
+                "last_ms": self._skews[-1] * 1000.0,
+                "p50_ms": percentile(values, 0.50) * 1000.0,
+                "p99_ms": percentile(values, 0.99) * 1000.0,
+                "max_ms": values[-1] * 1000.0}
+
+    def torque_stats(self):
+        """Consignes reçues, et par moteur : écrites, sautées (bande morte) et remplacées."""
+        stats = {"commands": self.torque_commands}
+        for name in ("m1", "m2"):
+            motor = getattr(self, name)
+            if motor:
+                stats[name] = motor.stats()
+        return stats
 
     def set_forward(self):
-        if self.m1: self.m1.set_direction("CW")
-        if self.m2: self.m2.set_direction("CCW")
+        self._apply("set_direction", ("CW",), ("CCW",))
 
     def set_reverse(self):
-        if self.m1: self.m1.set_direction("CCW")
-        if self.m2: self.m2.set_direction("CW")
+        self._apply("set_direction", ("CCW",), ("CW",))
 
     def set_torque(self, torque_value):
+        """
+        Asynchrone : rend la main tout de suite. Un moteur qui n'a pas encore
+        commencé la consigne précédente la remplace par celle-ci (la plus récente gagne).
+        """
         self._print("set_torque:", torque_value)
-        if self.m1: self.m1.set_torque(torque_value)
-        if self.m2: self.m2.set_torque(torque_value)
+        with self._dispatch_lock:
+            self._check_open()
+            self.torque_commands += 1
+            self._torque_command = self._post("apply_torque", (torque_value,), (torque_value,), torque=True)
+
+    def flush(self, timeout=None):
+        """Attend que la dernière consigne de couple soit appliquée (ou sautée)."""
+        command = self._torque_command
+        return command is None or command.finished.wait(timeout)
 
     def stop_motor(self):
         self._print("stop_motor()")
-        if self.m1:
-            try: self.m1.stop_motor()
-            except Exception as e: self._print("WARN stop m1:", e)
-        if self.m2:
-            try: self.m2.stop_motor()
-            except Exception as e: self._print("WARN stop m2:", e)
+        with self._dispatch_lock:
+            if self._closed:
+                return
+            # Une consigne encore en file ne doit pas être appliquée avant l'arrêt
+            command = self._torque_command
+            if command is not None and not command.finished.is_set():
+                self._torque_command = self._post("apply_torque", (0.0,), (0.0,), torque=True)
+        try:
+            self._apply("stop_motor", (), ())
+        except Exception as e:
+            self._print("WARN stop:", e)
+
+    def close(self):
+        # Arrête les workers après les commandes en file ; les commandes suivantes
+        # lèvent RuntimeError (stop_motor() et stop() ne font plus rien)
+        with self._dispatch_lock:
+            if self._closed:
+                return
+            self._closed = True
+        for motor in self._motors():
+            motor.stop_worker()
 
     # Optionnel
     def stop(self):
+        if self._closed:
+            return
         self.stop_motor()
+        self.close()
+
+
+class _Command:
+    """Une commande des deux moteurs, relâchée au même instant sur chaque worker."""
+    def __init__(self, calls, on_finished=None):
+        self.calls = calls  # {MotorController: (méthode, args)}
+        self.method = next(iter(calls.values()))[0]
+        self.on_finished = on_finished
+        self.release = threading.Barrier(len(calls))
+        self.release_missed = False
+        self.dropped = []  # moteurs où une commande plus récente l'a remplacée
+        self.applied = {}  # MotorController -> time.monotonic() de fin d'écriture
+        self.errors = []
+        self.finished = threading.Event()
+        self._done = 0
+        self._lock = threading.Lock()
+
+    def drop(self, motor):
+        # Remplacée dans la boîte de `motor` avant d'être commencée : jamais écrite.
+        # La barrière n'est pas cassée : l'autre worker attend au plus RELEASE_TIMEOUT.
+        self._finish(motor, dropped=True)
+
+    def __call__(self, motor):
+        method, args = self.calls[motor]
+        try:
+            self.release.wait(timeout=RELEASE_TIMEOUT)
+        except threading.BrokenBarrierError:
+            # L'autre worker est occupé ou bloqué : on applique quand même
+            self.release_missed = True
+        written = None
+        try:
+            written = getattr(motor, method)(*args)
+        except Exception as e:
+            motor.errors += 1
+            self.errors.append(e)
+            self._print_error(motor, method, e)
+        # apply_torque renvoie False quand la consigne est dans la bande morte
+        self._finish(motor, applied=written is not False and not self.errors)
+
+    def _finish(self, motor, applied=False, dropped=False):
+        with self._lock:
+            if applied:
+                self.applied[motor] = time.monotonic()
+            if dropped:
+                self.dropped.append(motor)
+            self._done += 1
+            finished = self._done == len(self.calls)
+        if finished:
+            if self.on_finished is not None:
+                self.on_finished(self)
+            self.finished.set()
+
+    @staticmethod
+    def _print_error(motor, method, error):
+        print(f"[{motor.node}] WARN: {method} failed: {error}")
+
+    def skew(self):
+        return max(self.applied.values()) - min(self.applied.values())
 
 
 if __name__ == "__main__":
@@ -71,4 +268,5 @@ if __name__ == "__main__":
     ctrl.set_torque(5)
     time.sleep(5)
 
-    ctrl.stop_motor()
+    print("skew:", ctrl.skew_stats())
+    ctrl.stop()
@@ -1,11 +1,17 @@
 import SoloPy as solo
 import RPi.GPIO as GPIO
+import collections
+import threading
 import time
 
 TIMEOUT = 30  # seconds
+CONNECT_POLL = 0.5  # seconds between two communication_is_working()
+TORQUE_DEADBAND = 0.05  # écart minimal avec la dernière consigne écrite pour la réécrire
 
 class MotorController:
     _gpio_initialized = False
+    # Both motors are brought up from parallel threads (DualMotorController)
+    _gpio_lock = threading.Lock()
 
     def __init__(
         self,
@@ -14,6 +20,7 @@ class MotorController:
         uart_port: str,
         uart_baud=None,
         verbose: bool = False,
+        torque_deadband: float = TORQUE_DEADBAND,
     ):
         if not isinstance(node, int):
             raise TypeError(f"[{node}] ERROR: node must be int")
@@ -30,10 +37,30 @@ class MotorController:
 
         self.mySolo = None
         self.connected = False
+        # Durée de chaque phase du démarrage (s) : sto, connect, configure
+        self.timings = {}
 
+        # File de commandes du worker (voir start_worker())
+        self.torque_deadband = torque_deadband
+        self.last_torque = None  # dernière consigne écrite sur l'UART
+        self.issued = 0          # consignes de couple écrites
+        self.skipped = 0         # consignes dans la bande morte, non écrites
+        self.superseded = 0      # consignes remplacées par une plus récente avant écriture
+        self.errors = 0
+        self._mailbox = collections.deque()
+        self._torque_job = None  # consigne de couple en attente, remplaçable (post_torque())
+        self._cond = threading.Condition()
+        self._worker = None
+        self._closing = False
+
+        start = time.monotonic()
         self._initialize_gpio_once()
         self._initialize_STO()
+        self.timings["sto"] = time.monotonic() - start
+
+        start = time.monotonic()
         self._initialize_motor()
+        self.timings["connect"] = time.monotonic() - start
 
     def _print(self, *args, **kwargs):
         if self.verbose:
@@ -41,10 +68,11 @@ class MotorController:
 
     @classmethod
     def _initialize_gpio_once(cls):
-        if not cls._gpio_initialized:
-            GPIO.setwarnings(False)
-            GPIO.setmode(GPIO.BCM)
-            cls._gpio_initialized = True
+        with cls._gpio_lock:
+            if not cls._gpio_initialized:
+                GPIO.setwarnings(False)
+                GPIO.setmode(GPIO.BCM)
+                cls._gpio_initialized = True
 
     def _initialize_STO(self):
         self._print("[MOTOR] Init STO with pin", self.stoPin)
@@ -55,12 +83,12 @@ class MotorController:
         self.mySolo = solo.SoloMotorControllerUart(self.uart_port, self.node, self.uart_baud)
 
         self._print(f"[MOTOR] Trying to connect over UART ({self.uart_port})...")
-        deadline = time.time() + TIMEOUT
+        deadline = time.monotonic() + TIMEOUT
         connected = False
         last_err = None
 
-        while time.time() < deadline:
-            time.sleep(0.5)
+        while time.monotonic() < deadline:
+            time.sleep(CONNECT_POLL)
             connected, last_err = self.mySolo.communication_is_working()
             if connected:
                 break
@@ -85,10 +113,12 @@ class MotorController:
         Aucune calibration, aucune identification.
         """
         self._ensure_connected()
+        start = time.monotonic()
         self.mySolo.set_command_mode(solo.CommandMode.DIGITAL)
         self.mySolo.set_motor_type(solo.MotorType.BLDC_PMSM)
         self.mySolo.set_feedback_control_mode(solo.FeedbackControlMode.HALL_SENSORS)
         self.mySolo.set_control_mode(solo.ControlMode.TORQUE_MODE)
+        self.timings["configure"] = time.monotonic() - start
         self._print("Configured (no calibration).")
 
     # ---------- STOP / SAFE ----------
@@ -106,6 +136,7 @@ class MotorController:
     def _stop_torque(self):
         try:
             self.mySolo.set_torque_reference_iq(0.0)
+            self.last_torque = 0.0
         except Exception:
             pass
         self._print("[Motor] torque set to zero")
@@ -142,8 +173,94 @@ class MotorController:
             if err != solo.Error.NO_ERROR_DETECTED:
                 raise RuntimeError(f"[{self.node}] set_torque_reference_iq failed: {err}")
 
+        # Référence de la bande morte de apply_torque(), même après un appel direct
+        self.last_torque = torque_value
         self._print("Torque set to", torque_value)
 
+    # ---------- WORKER ----------
+    # Les écritures UART bloquent : elles sont faites par un thread par moteur.
+    # Les commandes sont appliquées dans l'ordre où elles sont postées, sauf la
+    # consigne de couple : une seule en attente, remplacée par la plus récente.
+    def start_worker(self):
+        if self._worker is None:
+            self._closing = False
+            self._worker = threading.Thread(target=self._run_worker, name=f"motor-{self.node}", daemon=True)
+            self._worker.start()
+
+    def post(self, job):
+        """Ajoute job(motor) à la file du worker."""
+        with self._cond:
+            if self._closing or self._worker is None:
+                raise RuntimeError(f"[{self.node}] ERROR: motor worker is not running")
+            self._mailbox.append(job)
+            self._cond.notify()
+
+    def post_torque(self, job):
+        """
+        Comme post(), pour une consigne de couple : si la consigne précédente attend
+        encore en fin de file, elle est remplacée (la plus récente gagne) et son
+        job.drop(motor) est appelé s'il existe.
+        """
+        with self._cond:
+            if self._closing or self._worker is None:
+                raise RuntimeError(f"[{self.node}] ERROR: motor worker is not running")
+            replaced = None
+            if self._mailbox and self._mailbox[-1] is self._torque_job:
+                replaced = self._mailbox.pop()
+                self.superseded += 1
+            self._mailbox.append(job)
+            self._torque_job = job
+            self._cond.notify()
+        drop = getattr(replaced, "drop", None)
+        if drop is not None:
+            drop(self)
+
+    def command_torque(self, torque_value):
+        """Consigne de couple asynchrone, appliquée par le worker (bande morte comprise)."""
+        self.post_torque(lambda motor: motor.apply_torque(torque_value))
+
+    def apply_torque(self, torque_value):
+        """Ecrit la consigne si elle sort de la bande morte. Renvoie False si elle est sautée."""
+        torque_value = float(torque_value)
+        last = self.last_torque
+        # 0 est toujours écrit exactement (arrêt)
+        if last is not None and abs(torque_value - last) <= self.torque_deadband \
+                and (torque_value != 0.0 or last == 0.0):
+            self.skipped += 1
+            return False
+        self.set_torque(torque_value)
+        self.issued += 1
+        return True
+
+    def _run_worker(self):
+        while True:
+            with self._cond:
+                while not self._mailbox and not self._closing:
+                    self._cond.wait()
+                if not self._mailbox:
+                    return
+                job = self._mailbox.popleft()
+                if job is self._torque_job:
+                    self._torque_job = None
+            try:
+                job(self)
+            except Exception as e:
+                self.errors += 1
+                print(f"[{self.node}] WARN: motor command failed: {e}")
+
+    def stop_worker(self):
+        # Les commandes déjà en file sont appliquées avant l'arrêt
+        with self._cond:
+            self._closing = True
+            self._cond.notify()
+        if self._worker is not None:
+            self._worker.join(timeout=1.0)
+            self._worker = None
+
+    def stats(self):
+        return {"issued": self.issued, "skipped": self.skipped, "superseded": self.superseded,
+                "errors": self.errors, "last_torque": self.last_torque}
+
     # ---------- FEEDBACK ----------
     def display_torque(self):
         torque, error = self.mySolo.get_quadrature_current_iq_feedback()
@@ -10,12 +10,15 @@ import json
 import time
 import threading
 import argparse
+from concurrent.futures import Future
 from dotenv import load_dotenv
 import paho.mqtt.client as mqtt
 
-from CAN_system.CANSystem_p import CANSystem
+from CAN_system.CANSystem import CANSystem
 from .DualMotorController import DualMotorController
 from .SteerController import SteerController
+from .ControlLoop import ControlLoop, DEFAULT_RATE_HZ
+from .StateMachine import StateMachine, ANY
 
 # Load environment variables
 load_dotenv()
@@ -31,22 +34,34 @@ load_dotenv()
 MAX_TORQUE = 20.0
 TORQUE_SCALE = MAX_TORQUE / 1023.0
 STAY_ERROR_MODE_SLEEP = 3.0
+START_STEER_DELAY = 0.2
 BTN_AUTO_MODE = 0
 BTN_MANUAL_MODE = 1
 
+# Watchdogs of the control loop : inputs older than this are considered lost (s).
+# accel_pedal and steer_status are repeated by the kernel of the sender (BCM)
+# even when its Python loop hangs : an input is only fresh when its 'alive'
+# counter changed, so a hung loop is detected as well as a dead process or bus.
+PEDAL_TIMEOUT = 0.3
+STEER_FEEDBACK_TIMEOUT = 0.3
+
 # Constants for AUTO mode
 MAX_AUTO_SPEED = 30.0  # km/h maximum
 TORQUE_AT_MAX_SPEED = 15.0  # Nm at max speed
 
 class OBU:
-    def __init__(self, verbose=False):
+    def __init__(self, verbose=False, latency_dump_period=None, control_rate=DEFAULT_RATE_HZ):
         self.verbose = verbose
+        # Modes (INIT, INITIALIZE, START, MANUAL, AUTO, ERROR, OFF), see _build_mode_machine()
+        self.modes = self._build_mode_machine()
         self.readyComponents = set()
-        self.mode = "INIT"
         self.state = None
         self.running = True
 
-        self.canSystem = CANSystem(verbose=self.verbose, device_name='OBU')
+        self.canSystem = CANSystem(verbose=self.verbose, device_name='OBU', queue_policy="edf",
+                                   shared_bus=True, tx_scheduler=True,
+                                   instrument=latency_dump_period is not None,
+                                   latency_dump_period=latency_dump_period)
         self.canSystem.set_callback(self.on_can_message)
 
         self.motors = None
@@ -55,11 +70,26 @@ class OBU:
         self.last_steering = 0.0
         self.last_throttle = 0.0
 
-        self.canSystem.start_listening()
+        # Torque requested by the accelerator pedal, applied by the control loop
+        self.torque_target = 0.0
+        self._torque_applied = None
+        # time.monotonic() of the last pedal / steer feedback frame (watchdogs)
+        self._last_pedal = None
+        self._last_steer_feedback = None
+        self._pedal_lost = False
+        self._steer_feedback_lost = False
+        # Last 'alive' counter of accel_pedal / steer_status
+        self._pedal_alive = None
+        self._steer_alive = None
+
+        # Futures resolved when each component is ready (see _enter_initialize_mode()).
+        # Registered before listening : a ready frame received before INITIALIZE is
+        # acked by _handle_*_ready(), and the node does not send it again.
+        self._ready_futures = {}
+        self._pending_ready = set()
+        self._expect_ready()
 
-        self._brake_ready_evt = threading.Event()
-        self._steer_ready_evt = threading.Event()
-        self._motor_ready_evt = threading.Event()
+        self.canSystem.start_listening()
 
         self.current_direction = None  # "FORWARD" or "REVERSE"
 
@@ -76,8 +106,16 @@ class OBU:
         self.btn_auto_manu = None   # 1 => MANUAL, 0 => AUTO
         self.btn_reverse   = None   # 1 => FORWARD, 0 => REVERSE
 
-        self._retry_scheduled = False
-        self._change_mode("INITIALIZE")
+        # Fixed-rate control loop : steering, torque and watchdogs every tick
+        self.control = ControlLoop([
+            ("steer", self._steer_tick),
+            ("torque", self._torque_tick),
+            ("watchdog", self._watchdog_tick),
+        ], rate_hz=control_rate, verbose=self.verbose)
+        self.control.start()
+
+        self.modes.start()
+        self.modes.post("init")
 
     # === MQTT Callbacks ===
     # def on_mqtt_connect(self, client, userdata, flags, rc):
@@ -129,7 +167,10 @@ class OBU:
             case "bouton_reverse":
                 self._handle_bouton_reverse(data)
             case "steer_pos_real":
+                self._last_steer_feedback = time.monotonic()
                 self.steer.on_feedback(data)
+            case "steer_status":
+                self._handle_steer_status(data)
             case "steer_target":
                 if self.mode == "AUTO":
                     self.steer.set_target(data)
@@ -141,7 +182,6 @@ class OBU:
         print("[OBU] brake_rdy received")
         self.readyComponents.add("brake_rdy")
         self.canSystem.can_send("BRAKE", "ready_ack", 0)
-        self._brake_ready_evt.set()
         if self.mode != "INITIALIZE":
             self.canSystem.can_send("BRAKE", "start", 0)
 
@@ -149,7 +189,6 @@ class OBU:
         print("[OBU] steer_rdy received")
         self.readyComponents.add("steer_rdy")
         self.canSystem.can_send("STEER", "ready_ack", 0)
-        self._steer_ready_evt.set()
         if self.mode != "INITIALIZE":
             self.canSystem.can_send("STEER", "start", 0)
             if self.mode == "AUTO":
@@ -161,17 +200,32 @@ class OBU:
         if self.mode != "MANUAL":
             return
         try:
-            torque_value = float(data) * TORQUE_SCALE
-            if self.motors:
-                self.motors.set_torque(torque_value)
-            if self.verbose:
-                print(f"[MANUAL] acceleration_pedal = {data} => torque_value = {torque_value:.2f}")
+            value, alive = data["value"], data["alive"]
+            torque_value = float(value) * TORQUE_SCALE
         except Exception:
             print(f"ERROR: Invalid torque data: {data}")
+            return
+        # Same counter : frame repeated by the kernel, the front loop may be hung
+        if alive == self._pedal_alive:
+            return
+        self._pedal_alive = alive
+        # Applied by the next control tick
+        self.torque_target = torque_value
+        self._last_pedal = time.monotonic()
+        if self.verbose:
+            print(f"[MANUAL] acceleration_pedal = {value} => torque_value = {torque_value:.2f}")
+
+    def _handle_steer_status(self, data):
+        # Same counter : frame repeated by the kernel, the steer loop may be hung
+        if data["alive"] == self._steer_alive:
+            return
+        self._steer_alive = data["alive"]
+        self._last_steer_feedback = time.monotonic()
+        self.steer.on_status(data)
 
     def _handle_brake_enable(self):
         print("Shutdown requested via brake_enable.")
-        self.shutdown()
+        self._change_mode("OFF")
 
     def _handle_bouton_on_off(self, data):
         self._handle_bouton_reverse(data)
@@ -184,10 +238,7 @@ class OBU:
         except Exception:
             print(f"[OBU] WARN: invalid reverse button value: {data}")
             return
-        if self.mode != "INITIALIZE":
-            newState = "FORWARD" if val == 1 else "REVERSE"
-            print(f"[DEBUG] newState = {newState}")
-            self._change_state(newState)
+        self.modes.post("btn_reverse", val)
 
     def _handle_bouton_auto_manu(self, data):
         try:
@@ -197,9 +248,7 @@ class OBU:
         except Exception:
             print(f"[OBU] WARN: invalid auto/manu button value: {data}")
             return
-        if self.mode != "INITIALIZE":
-            newMode = "MANUAL" if int(data) == 1 else "AUTO"
-            self._change_mode(newMode)
+        self.modes.post("btn_auto_manu", val)
 
     def _handle_bouton_park(self):
         print("PARK button pressed: behavior not implemented.")
@@ -207,87 +256,161 @@ class OBU:
     def _handle_event(self, messageType, data):
         print(f"[Unhandled] {messageType}, data: {data}, state: {self.state}")
 
+    # === Control loop ===
+    def _steer_tick(self):
+        if self.mode == "AUTO":
+            self.steer.update()
+
+    def _torque_tick(self):
+        if self.mode != "MANUAL" or not self.motors:
+            return
+        torque = self.torque_target
+        if torque != self._torque_applied:
+            self.motors.set_torque(torque)
+            self._torque_applied = torque
+
+    def _watchdog_tick(self):
+        now = time.monotonic()
+        if self.mode == "MANUAL":
+            lost = self._last_pedal is None or now - self._last_pedal > PEDAL_TIMEOUT
+            if lost and not self._pedal_lost and self._last_pedal is not None:
+                print("[OBU] WARN: accel_pedal lost, torque set to 0")
+            if lost:
+                self.torque_target = 0.0
+            self._pedal_lost = lost
+        elif self.mode == "AUTO":
+            lost = self._last_steer_feedback is None or now - self._last_steer_feedback > STEER_FEEDBACK_TIMEOUT
+            if lost and not self._steer_feedback_lost:
+                print("[OBU] WARN: steer feedback lost, steering on hold")
+                # SteerController.update() does nothing without a measure
+                self.steer.meas = None
+            self._steer_feedback_lost = lost
+
+    def control_stats(self):
+        # Jitter / overruns of the control loop
+        return self.control.stats()
+
     # === Mode Management ===
+    # Modes are the states of self.modes (StateMachine) : every transition runs on
+    # its thread, the CAN / MQTT callbacks only post events.
+    def _build_mode_machine(self):
+        transitions = {
+            ("INIT", "init"): "INITIALIZE",
+            ("INITIALIZE", "ready"): self._on_component_ready,
+            ("START", "started"): self._on_started,
+            ("ERROR", "retry"): "INITIALIZE",
+            (ANY, "error"): "ERROR",
+            (ANY, "off"): "OFF",
+        }
+        for mode in ("START", "MANUAL", "AUTO"):
+            transitions[(mode, "btn_reverse")] = self._on_reverse_button
+        for mode in ("MANUAL", "AUTO"):
+            transitions[(mode, "btn_auto_manu")] = self._mode_from_button
+        on_enter = {
+            "INITIALIZE": self._enter_initialize_mode,
+            "START": self._enter_start_mode,
+            "MANUAL": self._enter_manual_mode,
+            "AUTO": self._enter_auto_mode,
+            "ERROR": self._enter_error_mode,
+            "OFF": self.shutdown,
+        }
+        return StateMachine("INIT", transitions, on_enter, name="OBU", verbose=self.verbose)
+
+    @property
+    def mode(self):
+        return self.modes.state
+
     def _change_mode(self, newMode):
-        self.mode = newMode
-        match newMode:
-            case "INITIALIZE":
-                print("[OBU] Entering INITIALIZE mode")
-                self._brake_ready_evt.clear()
-                self._steer_ready_evt.clear()
-                self._motor_ready_evt.clear()
-                self._initialize_components()
-                self._wait_for_ready()
-                self._change_mode("START")
-            case "START":
-                print("[OBU] Entering START mode")
-                self._enter_start_mode()
-                if self.btn_auto_manu == BTN_MANUAL_MODE:
-                    self._change_mode("MANUAL")
-                elif self.btn_auto_manu == BTN_AUTO_MODE:
-                    self._change_mode("AUTO")
-                else:
-                    self._change_mode("MANUAL")
-            case "MANUAL":
-                print("[OBU] Entering MANUAL mode")
-                self._enter_manual_mode()
-            case "AUTO":
-                print("[OBU] Entering AUTO mode")
-                self._enter_auto_mode()
-            case "ERROR":
-                print("[OBU] Entering ERROR mode")
-                time.sleep(STAY_ERROR_MODE_SLEEP)
-                self._change_mode("INITIALIZE")
-            case "OFF":
-                self.shutdown()
-            case _:
-                print(f"Unknown mode '{newMode}'")
-                self._change_mode("OFF")
+        # Requests a mode change from any thread (handled by the mode machine)
+        self.modes.post({"ERROR": "error", "OFF": "off"}[newMode])
+
+    def _mode_from_button(self, data):
+        # bouton_auto_manu event : 1 => MANUAL, anything else => AUTO
+        return "MANUAL" if data == BTN_MANUAL_MODE else "AUTO"
+
+    def _start_mode(self):
+        # Mode after START : MANUAL unless the button is known to be on AUTO
+        if self.btn_auto_manu == BTN_AUTO_MODE:
+            return "AUTO"
+        return "MANUAL"
+
+    def _on_reverse_button(self, data):
+        newState = "FORWARD" if data == 1 else "REVERSE"
+        print(f"[DEBUG] newState = {newState}")
+        self._change_state(newState)
 
     # === Mode Handlers ===
-    def _wait_for_ready(self):
+    def _expect_ready(self):
+        # Components already ready (ERROR -> INITIALIZE) are not waited for again
+        for name, order in (("BRAKE", "brake_rdy"), ("STEER", "steer_rdy")):
+            future = self._ready_futures.get(name)
+            if future is None or (future.done() and (future.cancelled() or future.exception() is not None)):
+                self._ready_futures[name] = self.canSystem.expect(order)
+
+    def _enter_initialize_mode(self):
         print("[OBU] Waiting for BRAKE, STEER and MOTOR to be ready…")
-        events = {
-            "BRAKE": self._brake_ready_evt,
-            "STEER": self._steer_ready_evt,
-            "MOTOR": self._motor_ready_evt,
-        }
-        pending = set(events.keys())
-        while pending:
-            for name in list(pending):
-                evt = events[name]
-                if evt.wait(timeout=0.1):
-                    print(f"[OBU]  {name} ready")
-                    pending.remove(name)
+        self._expect_ready()
+        if self.motors is None:
+            self._ready_futures["MOTOR"] = Future()
+            threading.Thread(target=self._initialize_components, name="OBU-motor-init", daemon=True).start()
+        self._pending_ready = set(self._ready_futures)
+        for name, future in self._ready_futures.items():
+            future.add_done_callback(lambda future, name=name: self._on_ready_future(name, future))
+
+    def _on_ready_future(self, name, future):
+        # A cancelled (closed transactions) or failed future does not make a component ready
+        if future.cancelled() or future.exception() is not None:
+            print(f"[OBU] WARN: {name} ready wait ended without ready message")
+            return
+        self.modes.post("ready", name)
+
+    def _on_component_ready(self, name):
+        if name not in self._pending_ready:
+            return None
+        print(f"[OBU]  {name} ready")
+        self._pending_ready.discard(name)
+        if self._pending_ready:
+            return None
         print("[OBU]  All required components ready.")
+        return "START"
 
     def _initialize_components(self):
+        # Runs on its own thread : the UART connection takes seconds
         print("[OBU] Initialization phase started.")
         try:
-            if self.motors is None:
-                print("[OBU] Trying to connect to SOLO…")
-                self.motors = DualMotorController(verbose=self.verbose)
-                print("[OBU] [MOTOR] Configuring SOLO (UART)...")
-                self.motors.configure()
-                print("[OBU] [MOTOR] Communication Established successfully!")
-            self._motor_ready_evt.set()
+            print("[OBU] Trying to connect to SOLO…")
+            motors = DualMotorController(verbose=self.verbose)
+            print("[OBU] [MOTOR] Configuring SOLO (UART)...")
+            motors.configure()
+            print("[OBU] [MOTOR] Communication Established successfully!")
+            print(f"[OBU] [MOTOR] {motors.startup_report()}")
+            self.motors = motors
+            self._ready_futures["MOTOR"].set_result(True)
         except Exception as e:
             print(f"[OBU] [MOTOR] Error during motor init: {e}")
-            self.motors = None
-            self._motor_ready_evt.clear()
+            self.modes.post("error", e)
 
     def _enter_start_mode(self):
         self.canSystem.can_send("BRAKE", "start", 0)
-        time.sleep(0.2)
+        # The steer is started 200 ms after the brake
+        self.modes.post_after(START_STEER_DELAY, "started")
+
+    def _on_started(self, data=None):
         if "steer_rdy" in self.readyComponents:
             self.canSystem.can_send("STEER", "start", 0)
+        return self._start_mode()
+
+    def _enter_error_mode(self):
+        self.modes.post_after(STAY_ERROR_MODE_SLEEP, "retry")
 
     def _enter_manual_mode(self):
         print("MANUAL mode activated.")
         self._apply_direction_from_button()
         self.steer.enable(False)
+        self.torque_target = 0.0
         if self.motors:
             self.motors.set_torque(0.0)
+        self._torque_applied = 0.0
 
     def _enter_auto_mode(self):
         print("AUTO mode activated.")
@@ -370,7 +493,10 @@ class OBU:
         if self.motors:
             try:
                 print("[OBU] Stopping motors...")
-                self.motors.stop_motor()
+                self.motors.stop()
+                if self.verbose:
+                    print(f"[OBU] [MOTOR] left/right skew: {self.motors.skew_stats()}")
+                    print(f"[OBU] [MOTOR] torque commands: {self.motors.torque_stats()}")
             except Exception as e:
                 print(f"[OBU] Error stopping motor: {e}")
         try:
@@ -383,6 +509,9 @@ class OBU:
             return
         print("Shutting down system...")
         self.running = False
+        self.modes.stop()
+        self.control.stop()
+        print(f"[OBU] control loop: {self.control.format()}")
         try:
             self.canSystem.can_send("BRAKE", "stop", 0)
             self.canSystem.can_send("STEER", "stop", 0)
@@ -397,18 +526,17 @@ class OBU:
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="OBU system")
     parser.add_argument('-v', '--verbose', action='store_true', help='Enable verbose output')
+    parser.add_argument('--latency', type=float, metavar='PERIOD',
+                        help='Print CAN receive latency statistics every PERIOD seconds')
+    parser.add_argument('--rate', type=float, default=DEFAULT_RATE_HZ,
+                        help=f'Control loop rate in Hz (default {DEFAULT_RATE_HZ:.0f})')
     args = parser.parse_args()
 
-    obu = OBU(verbose=args.verbose)
+    obu = OBU(verbose=args.verbose, latency_dump_period=args.latency, control_rate=args.rate)
 
     try:
-        test_positions = [512, 0, 512, 1023]
-        counter = 0
         while obu.running:
-            position = test_positions[counter % len(test_positions)]
-            obu.canSystem.can_send("STEER", "steer_pos_set", position)
-            counter += 1
-            time.sleep(2)
+            time.sleep(0.5)
     except KeyboardInterrupt:
         print("KeyboardInterrupt received.")
         obu.shutdown()
@@ -0,0 +1,132 @@
+# back_part/StateMachine.py
+import collections
+import heapq
+import itertools
+import queue
+import threading
+import time
+
+HISTORY = 64
+ANY = "*"
+
+
+class StateMachine(threading.Thread):
+    """
+    Machine à états pilotée par une table, sur son propre thread.
+    - transitions = {(état, événement): cible} ; état ANY ("*") = depuis tout état.
+      cible = nom d'état, ou fonction(data) -> nom d'état / None (rester sans transition).
+    - on_enter = {état: fonction()} : appelée à l'entrée dans l'état (y compris état -> même état).
+    - post(événement, data) se contente de mettre en file : l'appelant (thread CAN,
+      thread MQTT...) n'est jamais bloqué par une transition.
+    - post_after(délai, événement) remplace les sleep : le minuteur est annulé si
+      l'état change avant son échéance.
+    - Une exception dans une action poste error_event (None = pas de repli).
+    - Chaque transition est journalisée avec son attente en file et la durée de l'action.
+    """
+    def __init__(self, initial, transitions, on_enter=None, error_event="error",
+                 name="StateMachine", log=print, verbose=False):
+        super().__init__(name=name, daemon=True)
+        self.state = initial
+        self.transitions = dict(transitions)
+        self.on_enter = dict(on_enter or {})
+        self.error_event = error_event
+        self.log = log
+        self.verbose = verbose
+        self.history = collections.deque(maxlen=HISTORY)  # (événement, de, vers, attente s, durée s)
+
+        self._events = queue.Queue()
+        self._timers = []  # heap (échéance, n°, état d'origine, événement, data)
+        self._timers_lock = threading.Lock()
+        self._timer_ids = itertools.count()
+        self._cancelled = set()
+        self._stop_evt = threading.Event()
+
+    def _print(self, *args, **kwargs):
+        if self.verbose:
+            print(f"[{self.name}]", *args, **kwargs)
+
+    # --- API (thread-safe) ---
+    def post(self, event, data=None):
+        self._events.put((event, data, time.monotonic()))
+
+    def post_after(self, delay, event, data=None):
+        """Poste `event` dans `delay` s, si l'état n'a pas changé entre-temps. Renvoie un id pour cancel()."""
+        timer_id = next(self._timer_ids)
+        with self._timers_lock:
+            heapq.heappush(self._timers, (time.monotonic() + delay, timer_id, self.state, event, data))
+        # Réveille la boucle pour qu'elle prenne en compte la nouvelle échéance
+        self._events.put(None)
+        return timer_id
+
+    def cancel(self, timer_id):
+        with self._timers_lock:
+            self._cancelled.add(timer_id)
+
+    # --- Boucle ---
+    def _next_timeout(self):
+        with self._timers_lock:
+            if not self._timers:
+                return None
+            return max(0.0, self._timers[0][0] - time.monotonic())
+
+    def _fire_timers(self):
+        now = time.monotonic()
+        due = []
+        with self._timers_lock:
+            while self._timers and self._timers[0][0] <= now:
+                deadline, timer_id, state, event, data = heapq.heappop(self._timers)
+                if timer_id in self._cancelled:
+                    self._cancelled.discard(timer_id)
+                elif state == self.state:
+                    due.append((event, data, deadline))
+        for event, data, deadline in due:
+            self._handle(event, data, deadline)
+
+    def run(self):
+        while not self._stop_evt.is_set():
+            try:
+                item = self._events.get(timeout=self._next_timeout())
+            except queue.Empty:
+                item = None
+            if self._stop_evt.is_set():
+                break
+            if item is not None:
+                self._handle(*item)
+            self._fire_timers()
+
+    def _handle(self, event, data, posted_at):
+        target = self.transitions.get((self.state, event))
+        if target is None:
+            target = self.transitions.get((ANY, event))
+        if target is None:
+            self._print(f"{event} ignored in {self.state}")
+            return
+        start = time.monotonic()
+        try:
+            if callable(target):
+                target = target(data)
+            if target is not None:
+                self._enter(target)
+        except Exception as e:
+            self.log(f"[{self.name}] {event} failed in {self.state}: {e}")
+            if self.error_event is not None and event != self.error_event:
+                self.post(self.error_event, e)
+            return
+        if target is not None:
+            end = time.monotonic()
+            self.history.append((event, self._previous, target, start - posted_at, end - start))
+            self.log(f"[{self.name}] {self._previous} -> {target} on {event} "
+                     f"(queued {(start - posted_at) * 1000.0:.1f} ms, took {(end - start) * 1000.0:.1f} ms)")
+
+    def _enter(self, target):
+        self._previous = self.state
+        self.state = target
+        action = self.on_enter.get(target)
+        if action is not None:
+            action()
+
+    def stop(self):
+        self._stop_evt.set()
+        self._events.put(None)
+        if self.is_alive() and self is not threading.current_thread():
+            self.join()
@@ -6,6 +6,7 @@ class SteerController:
     Contrôle de la direction côté OBU.
     - Reçoit une cible haute-niveau (steer_target) -> via set_target()
     - Reçoit le feedback capteur (steer_pos_real) -> via on_feedback()
+      ou l'état complet de l'actionneur (steer_status) -> via on_status()
     - A chaque update(), calcule une consigne 'steer_pos_set' et l'envoie via CAN.
     """
     def __init__(self, canSystem, kp: float = 0.8, max_step: int = 30, verbose: bool = False):
@@ -18,6 +19,8 @@ class SteerController:
         self.target = None            # cible (int, ex 0..1023)
         self.meas = None              # feedback courant
         self.last_set = None          # mémo dernière commande envoyée
+        self.actuator_enabled = None  # enable rapporté par le noeud direction
+        self.out_of_bounds = False    # position hors limites mécaniques
         self.last_update = time.time()
 
     # --- API exposée à OBU ---
@@ -43,6 +46,15 @@ class SteerController:
         except Exception:
             self._log(f"Invalid steer_pos_real: {meas}")
 
+    def on_status(self, status: dict):
+        # steer_status : {"position", "enabled", "out_of_bounds"}
+        self.on_feedback(status["position"])
+        self.actuator_enabled = bool(status["enabled"])
+        out_of_bounds = bool(status["out_of_bounds"])
+        if out_of_bounds and not self.out_of_bounds:
+            self._log(f"position out of bounds: {self.meas}")
+        self.out_of_bounds = out_of_bounds
+
     # --- Tick périodique (appelé par OBU en AUTO) ---
     def update(self):
         if not self.enabled or self.target is None or self.meas is None:
@@ -1,7 +1,7 @@
 import time
 import argparse
 
-from CAN_system.CANSystem_p import CANSystem
+from CAN_system.CANSystem import CANSystem
 from .DualMotorController import DualMotorController
 from .SteerController import SteerController
 
@@ -51,7 +51,7 @@ def main(verbose=False):
     print("===== MODE TEST =====")
 
     # --- CAN ---
-    can = CANSystem(verbose=verbose, device_name="TEST")
+    can = CANSystem(verbose=verbose, device_name="TEST", queue_policy="priority", shared_bus=True)
     can.start_listening()
 
     # --- MOTEURS ---
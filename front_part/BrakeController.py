@@ -57,9 +57,10 @@ class BrakeController(AbstractController):
                 miso=self.MISO, mosi=self.MOSI, gpio=gpio
             )
             
-            # Enregistrer le callback CAN
+            # Abonnement aux ordres CAN de l'OBU
             if self.can_adapter:
-                self.can_adapter.register_callback(self._on_can_message)
+                self.can_adapter.subscribe("brake_pos_set", self._on_can_message)
+                self.can_adapter.subscribe("stop", self._on_can_message)
             
             self.is_initialized = True
             
@@ -74,7 +75,7 @@ class BrakeController(AbstractController):
             print(f"[BRAKE] Erreur: {e}")
             return False
 
-    def _on_can_message(self, msg_type, data):
+    def _on_can_message(self, device, msg_type, data):
         """Reçoit les messages CAN de l'OBU"""
         if self.verbose:
             print(f"[BRAKE] CAN: {msg_type}={data}")
@@ -113,7 +114,7 @@ class BrakeController(AbstractController):
     
     def send_ready(self):
         if self.can_adapter:
-            self.can_adapter.send_message("brake_rdy", "1")
+            self.can_adapter.send("OBU", "brake_rdy", 1)
             if self.verbose:
                 print("[BRAKE] Prêt signalé")
         return True
@@ -2,7 +2,7 @@ import argparse
 import time
 from .accelerator.sensor import AcceleratorSensor
 from .accelerator.controller import AcceleratorController
-from .CANAdapter import CANAdapter
+from CAN_system.CANAdapter import CANAdapter
 from AbstractClasses import AbstractController
 
 # Execute : python3 -m front_part.DeviceManager -v
@@ -79,7 +79,7 @@ if __name__ == "__main__":
     args = parser.parse_args()
     
     sensor = AcceleratorSensor(verbose=args.verbose)
-    transport = CANAdapter(verbose=args.verbose)
+    transport = CANAdapter(device_name="BRAKE", verbose=args.verbose)
     accel_controller = AcceleratorController(sensor, transport, verbose=args.verbose)
 
     manager = DeviceManager([accel_controller], verbose=args.verbose)
@@ -1,8 +1,7 @@
-import time
 import threading
 from .sensor import AcceleratorSensor
 from AbstractClasses import AbstractController
-from ..CANAdapter import CANAdapter
+from CAN_system.CANAdapter import CANAdapter
 
 """
     Contrôleur de la pédale d'accélération.
@@ -11,11 +10,15 @@ from ..CANAdapter import CANAdapter
       1) c.self_check()        -> vérifie que le capteur de la pédale d'accélaration est OK
       2) c.send_ready()        -> envoie 'brake_rdy' et attend ACK de l'OBU
       3) c.wait_for_start()    -> renvoie True lors de la première réception de 'start'
-      4) c.update() en boucle  -> lit capteur et envoie périodiquement 'accel_pedal'
+      4) c.update() en boucle  -> lit capteur et met à jour 'accel_pedal', envoyé
+                                  périodiquement par le noyau (BCM, ACCEL_PERIOD).
+                                  Le compteur 'alive' change à chaque appel : l'OBU
+                                  voit si cette boucle tourne encore
       5) c.stop()              -> arrêt propre
 """
 READY_TIMEOUT = 5.0          # secondes max avant abandon
-READY_RETRY_INTERVAL = 0.5   # secondes entre deux essais
+ACCEL_PERIOD = 0.05          # période d'envoi cyclique de 'accel_pedal'
+ALIVE_MASK = 0xF             # compteur de vie sur 4 bits (signal 'alive' de can_list.txt)
 
 class AcceleratorController(AbstractController):
     def __init__(self, sensor: AcceleratorSensor, transport: CANAdapter, verbose=False):
@@ -26,13 +29,16 @@ class AcceleratorController(AbstractController):
 
         # Synchronisation événements CAN
         self.start_event = threading.Event()  # signalé quand 'start' reçu
-        self.ready_ack = False                # devient True quand 'brake_ack' (ou équivalent) reçu
+        self.ready_ack = False                # devient True quand 'ready_ack' reçu
 
-        # S'abonne à la réception CAN via le transport
-        self.transport.add_handler(self._on_can)
+        # S'abonne aux ordres CAN utiles via le transport
+        self.transport.subscribe("start", self._on_start)
+        self.transport.subscribe("stop", self._on_stop)
 
         # Mémo de la dernière valeur envoyée (pour éviter du spam)
         self._last_sent = None
+        self._cyclic = False
+        self._alive = 0
 
     def self_check(self) -> bool:
         #Vérifie que le capteur renvoie une valeur cohérente
@@ -56,32 +62,27 @@ class AcceleratorController(AbstractController):
 
     def send_ready(self):
         #Annonce 'brake_rdy' à l'OBU (ready global du front).
-        self.ready_ack = False
-        deadline = time.time() + READY_TIMEOUT
-        while not self.ready_ack and time.time() < deadline:
-            self.transport.send("OBU", "brake_rdy")
-            self._print("Sent READY (brake_rdy) to OBU, waiting for ACK")
-            time.sleep(READY_RETRY_INTERVAL)
-        if self.ready_ack:
+        # brake_rdy est renvoyé (backoff) jusqu'au ready_ack de l'OBU
+        self._print("Sending READY (brake_rdy) to OBU, waiting for ACK")
+        try:
+            self.transport.request("OBU", "brake_rdy", ack_order="ready_ack", timeout=READY_TIMEOUT).result()
+            self.ready_ack = True
             self._print("READY acknowledged by OBU.")
-        else:
+        except TimeoutError:
+            self.ready_ack = False
             self._print("READY ACK from OBU (timeout). Continuing a...")
 
 
-    def _on_can(self, device, order, data):
-        #Callback appelé automatiquement quand un message CAN est reçu.
-        if order == "start":
-            self._print("Start command received.")
-            self.start_event.set()
-            self.running = True
+    # Callbacks appelés par le transport à la réception de l'ordre CAN correspondant
+    def _on_start(self, device, order, data):
+        self._print("Start command received.")
+        self.start_event.set()
+        self.running = True
 
-        elif order == "stop":
-            self._print("Stop command received.")
-            self.running = False
-
-        elif order == "ready_ack":
-            self._print("READY ACK received from OBU.")
-            self.ready_ack = True
+    def _on_stop(self, device, order, data):
+        self._print("Stop command received.")
+        self.running = False
+        self._stop_cyclic()
 
     def wait_for_start(self):
         #Renvoie True quand le start est reçu puis le remet à False. Pour qu'il initialise qu'une fois.
@@ -92,7 +93,7 @@ class AcceleratorController(AbstractController):
         return False
 
     def update(self):
-        #Lit la valeur de la pédale d'accélération, mappe la valeur et l'envoie si elle a changé. 
+        #Lit la valeur de la pédale d'accélération, mappe la valeur et met à jour la trame cyclique.
         if not self.running:
             return
 
@@ -100,12 +101,27 @@ class AcceleratorController(AbstractController):
         clamped = self.sensor.clamp_acceleration(raw)
         mapped = self.sensor.map_to_output(clamped)
 
-        if self.sensor.has_changed(mapped):
-            self.transport.send("OBU", "accel_pedal", mapped)
-            self._last_sent = mapped
+        changed = self.sensor.has_changed(mapped)
+        # Le noyau répète la dernière trame même si cette boucle est bloquée :
+        # la trame est mise à jour à chaque appel, avec un nouveau compteur de vie
+        self._alive = (self._alive + 1) & ALIVE_MASK
+        pedal = {"value": mapped, "alive": self._alive}
+        if not self._cyclic:
+            self.transport.start_cyclic("OBU", "accel_pedal", pedal, ACCEL_PERIOD)
+            self._cyclic = True
+        else:
+            self.transport.update_cyclic("OBU", "accel_pedal", pedal)
+        if changed:
             self._print(f"acceleration_pedal -> {mapped}")
+        self._last_sent = mapped
+
+    def _stop_cyclic(self):
+        if self._cyclic:
+            self.transport.stop_cyclic("OBU", "accel_pedal")
+            self._cyclic = False
 
     def stop(self):
+        self._stop_cyclic()
         self.transport.stop()
         self._print("Stopped accelerator controller.")
 
@@ -3,7 +3,7 @@ import argparse
 import time
 import RPi.GPIO as GPIO
 
-from .CANAdapter import CANAdapter
+from CAN_system.CANAdapter import CANAdapter
 from .steer_part import SteerController
 from .button_part import ButtonController
 from AbstractClasses import AbstractController
@@ -4,7 +4,7 @@ import RPi.GPIO as GPIO
 from typing import Optional
 
 from AbstractClasses import AbstractController
-from ..CANAdapter import CANAdapter
+from CAN_system.CANAdapter import CANAdapter
 
 
 class ButtonController(AbstractController):
@@ -5,7 +5,7 @@ import RPi.GPIO as GPIO
 import Adafruit_MCP3008
 
 from AbstractClasses import AbstractController
-from ..CANAdapter import CANAdapter
+from CAN_system.CANAdapter import CANAdapter
 
 PWM_FREQ_STEER = 1000
 STEER_DIR_PIN = 17
@@ -21,9 +21,9 @@ STEER_RIGHT_LIMIT = 923
 NEUTRAL_POSITION  = 512
 STEER_THRESHOLD   = 10
 FEEDBACK_PERIOD   = 0.05
+ALIVE_MASK        = 0xF   # compteur de vie sur 4 bits (signal 'alive' de steer_status)
 
 READY_TIMEOUT = 20.0
-READY_RETRY   = 0.5
 
 
 class SteerController(AbstractController):
@@ -50,10 +50,17 @@ class SteerController(AbstractController):
 
         self.mcp = Adafruit_MCP3008.MCP3008(clk=CLK, cs=CS, miso=MISO, mosi=MOSI)
 
-        # Enregistrement du handler CAN
-        self.t.add_handler(self._on_can)
+        # Abonnement aux ordres CAN
+        self.t.subscribe("start", self._on_start)
+        self.t.subscribe("stop", self._on_stop)
+        self.t.subscribe("steer_enable", self._on_steer_enable)
+        self.t.subscribe("steer_pos_set", self._on_steer_pos_set)
 
-        self._last_feedback_ts = 0.0
+        # Feedback steer_status (position + enable + hors limites, une seule trame)
+        # envoyé cycliquement par le noyau (BCM). Le compteur 'alive' change à chaque
+        # update() : l'OBU voit si cette boucle tourne encore
+        self._feedback_cyclic = False
+        self._alive = 0
 
     def _print(self, *a):
         if self.verbose:
@@ -109,17 +116,14 @@ class SteerController(AbstractController):
         GPIO.output(STEER_EN_PIN, GPIO.HIGH)
 
     def send_ready(self):
-        self.ready_ack = False
-        deadline = time.time() + READY_TIMEOUT
-
-        while not self.ready_ack and time.time() < deadline:
-            self.t.can_send("OBU", "steer_rdy", 1)
-            self._print("Sent steer_rdy — waiting for ACK…")
-            time.sleep(READY_RETRY)
-
-        if self.ready_ack:
+        # steer_rdy renvoyé (backoff) jusqu'au ready_ack de l'OBU
+        self._print("Sending steer_rdy — waiting for ACK…")
+        try:
+            self.t.request("OBU", "steer_rdy", 1, ack_order="ready_ack", timeout=READY_TIMEOUT).result()
+            self.ready_ack = True
             self._print("steer READY_ACK received.")
-        else:
+        except TimeoutError:
+            self.ready_ack = False
             self._print("steer READY_ACK timeout.")
 
     def wait_for_start(self):
@@ -133,16 +137,33 @@ class SteerController(AbstractController):
         if not self.running:
             return
 
-        now = time.time()
-        if now - self._last_feedback_ts >= FEEDBACK_PERIOD:
-            pos = self._read_pos()
-            self.t.can_send("OBU", "steer_pos_real", pos)
-            self._last_feedback_ts = now
+        pos = self._read_pos()
+        self._alive = (self._alive + 1) & ALIVE_MASK
+        status = {
+            "position": pos,
+            "enabled": int(self.steer_enable),
+            "out_of_bounds": int(pos < STEER_LEFT_LIMIT or pos > STEER_RIGHT_LIMIT),
+            "alive": self._alive,
+        }
+        if not self._feedback_cyclic:
+            self.t.start_cyclic("OBU", "steer_status", status, FEEDBACK_PERIOD)
+            self._feedback_cyclic = True
+        else:
+            self.t.update_cyclic("OBU", "steer_status", status)
 
         self._apply_control(self.target)
 
+    def _stop_feedback(self):
+        if self._feedback_cyclic:
+            self.t.stop_cyclic("OBU", "steer_status")
+            self._feedback_cyclic = False
+
     def stop(self):
         self.running = False
+        try:
+            self._stop_feedback()
+        except Exception:
+            pass
         try:
             self.pulse.ChangeDutyCycle(0)
             self.pulse.stop()
@@ -151,23 +172,18 @@ class SteerController(AbstractController):
             pass
 
     # ---------- CAN ----------
-    def _on_can(self, device, order, data):
-
-        if order == "start":
-            self._print("start received")
-            self._start_evt.set()
+    def _on_start(self, device, order, data):
+        self._print("start received")
+        self._start_evt.set()
 
-        elif order == "stop":
-            self.running = False
-
-        elif order == "ready_ack":
-            self._print("ready_ack received")
-            self.ready_ack = True
+    def _on_stop(self, device, order, data):
+        self.running = False
+        self._stop_feedback()
 
-        elif order == "steer_enable":
-            self.steer_enable = bool(int(data))
-            self._print("steer_enable =", self.steer_enable)
+    def _on_steer_enable(self, device, order, data):
+        self.steer_enable = bool(int(data))
+        self._print("steer_enable =", self.steer_enable)
 
-        elif order == "steer_pos_set":
-            self.target = int(data)
-            self._print("new target =", self.target)
+    def _on_steer_pos_set(self, device, order, data):
+        self.target = int(data)
+        self._print("new target =", self.target)
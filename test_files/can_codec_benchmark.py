@@ -0,0 +1,81 @@
+import argparse
+import time
+
+import can
+
+from CAN_system.CANSystem import CANManager
+
+# Execute : python3 -m test_files.can_codec_benchmark
+
+# Micro-benchmark of the CAN id codec used by CANManager/CANReceiver.
+# "legacy" reproduces the former string based path (hex formatting and
+# int(..., 16) parsing), "tables" uses the precomputed integer tables.
+# "encode" measures the id and payload encoding alone, "message" also builds
+# the can.Message, which takes most of the time of a send.
+# No CAN interface is needed: frames are built and decoded in memory.
+
+
+def legacy_encode_fields(manager, device_id, order_id, data):
+    device_value = manager.device_id_map.get(device_id)
+    order_value = manager.order_id_map.get(order_id)
+    arbitration_id = int(device_value + order_value, 16)
+    data_bytes = []
+    while data > 0:
+        data_bytes.insert(0, data & 0xFF)
+        data >>= 8
+    return arbitration_id, data_bytes
+
+
+def legacy_encode(manager, device_id, order_id, data):
+    arbitration_id, data_bytes = legacy_encode_fields(manager, device_id, order_id, data)
+    return can.Message(arbitration_id=arbitration_id, data=data_bytes, is_extended_id=False)
+
+
+def tables_encode_fields(manager, device_id, order_id, data):
+    return manager.encode(device_id, order_id), manager.encode_payload(order_id, data)
+
+
+def legacy_decode(manager, msg):
+    arbitration_id = msg.arbitration_id
+    device_hex = hex(arbitration_id >> 8)[2:].zfill(2)
+    order_hex = hex(arbitration_id & 0xFF)[2:].zfill(2)
+    data = int.from_bytes(msg.data, byteorder='big')
+    device = manager.device_id_reverse_map.get(device_hex, device_hex)
+    order = manager.order_id_reverse_map.get(order_hex, order_hex)
+    return device, order, data
+
+
+def tables_decode(manager, msg):
+    device, order = manager.decode(msg.arbitration_id)
+    return device, order, int.from_bytes(msg.data, byteorder='big')
+
+
+def rate(fn, n):
+    start = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return n / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', type=int, default=200000, help='Frames per measurement')
+    args = parser.parse_args()
+
+    manager = CANManager(bus=None, device_name='OBU')
+    msg = manager.build_message('OBU', 'steer_pos_real', 812)
+
+    results = [
+        ("encode legacy", rate(lambda: legacy_encode_fields(manager, 'OBU', 'steer_pos_real', 812), args.n)),
+        ("encode tables", rate(lambda: tables_encode_fields(manager, 'OBU', 'steer_pos_real', 812), args.n)),
+        ("message legacy", rate(lambda: legacy_encode(manager, 'OBU', 'steer_pos_real', 812), args.n)),
+        ("message tables", rate(lambda: manager.build_message('OBU', 'steer_pos_real', 812), args.n)),
+        ("decode legacy", rate(lambda: legacy_decode(manager, msg), args.n)),
+        ("decode tables", rate(lambda: tables_decode(manager, msg), args.n)),
+    ]
+    for name, value in results:
+        print(f"{name:<15} {value:>12,.0f} frames/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+import argparse
+import time
+
+from CAN_system.CANSystem import CANManager
+from CAN_system.CANDbc import dump_dbc, parse_dbc, cantools
+
+# Execute : python3 -m test_files.can_decode_benchmark
+
+# Payload decoding throughput on the receive path :
+# - "int.from_bytes" : decoding of an integer order, as done for every frame
+#   before the signal layouts
+# - "layout (compiled)" : steer_status unpacked by its generated decoder
+#   (can_list.txt Signals section, or a DBC file loaded at startup)
+# - "layout (loop)" : same signals extracted by a generic loop over the signals
+# - "cantools" : cantools decode_message(), when cantools is installed
+# No CAN interface is needed.
+
+
+def generic_unpack(layout, data):
+    payload = int.from_bytes(data, 'little')
+    values = {}
+    for signal in layout.signals:
+        raw = (payload >> signal.shift) & signal.mask
+        if signal.signed and raw > signal.maximum:
+            raw -= 1 << signal.length
+        values[signal.name] = raw * signal.scale + signal.offset
+    return values
+
+
+def bench(label, fn, payloads, frames):
+    count = len(payloads)
+    start = time.perf_counter()
+    for i in range(frames):
+        fn(payloads[i % count])
+    elapsed = time.perf_counter() - start
+    print(f"{label:<22} {frames / elapsed:12,.0f} frames/s  {elapsed / frames * 1e9:8.0f} ns/frame")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CAN payload decoding benchmark")
+    parser.add_argument("-n", "--frames", type=int, default=500000)
+    args = parser.parse_args()
+
+    manager = CANManager(bus=None, device_name="OBU")
+    layout = manager.signal_layouts["steer_status"]
+    integers = [manager.encode_data(value) for value in range(1, 1024, 7)]
+    statuses = [layout.pack({"position": value, "enabled": value & 1, "out_of_bounds": value > 923})
+                for value in range(0, 1024, 7)]
+    dbc_layout = parse_dbc(dump_dbc(manager)).layouts()["steer_status"]
+
+    bench("int.from_bytes", lambda data: int.from_bytes(data, byteorder='big'), integers, args.frames)
+    bench("layout (compiled)", layout.unpack, statuses, args.frames)
+    bench("layout DBC (compiled)", dbc_layout.unpack, statuses, args.frames)
+    bench("layout (loop)", lambda data: generic_unpack(layout, data), statuses, args.frames)
+    if cantools is not None:
+        database = cantools.database.load_string(dump_dbc(manager), database_format="dbc")
+        arbitration_id = manager.encode("OBU", "steer_status")
+        bench("cantools", lambda data: database.decode_message(arbitration_id, data), statuses, args.frames)
+    else:
+        print("cantools not installed, skipped")
+
+
+if __name__ == "__main__":
+    main()
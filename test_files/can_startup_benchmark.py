@@ -0,0 +1,49 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+# Execute : python3 -m test_files.can_startup_benchmark
+
+# Construction time of CANSystem() in a fresh process (what a node pays at
+# startup, schema parsed and compiled), and of a second CANSystem in the same
+# process (schema shared with the first one).
+# Uses the "virtual" interface : no CAN hardware needed.
+
+CHILD = """
+import time
+start = time.perf_counter()
+from CAN_system.CANSystem import CANSystem
+imported = time.perf_counter()
+first = CANSystem("OBU", channel="startup-bench", interface="virtual")
+built = time.perf_counter()
+second = CANSystem("BRAKE", channel="startup-bench", interface="virtual")
+second_built = time.perf_counter()
+first.stop(); second.stop()
+print(imported - start, built - imported, second_built - built)
+"""
+
+
+def run_child(root):
+    output = subprocess.run([sys.executable, "-c", CHILD], cwd=root, capture_output=True, text=True,
+                            check=True).stdout.split()
+    return [float(value) * 1000.0 for value in output]
+
+
+def report(label, samples):
+    columns = list(zip(*samples))
+    print(f"{label} import {statistics.median(columns[0]):7.2f} ms   CANSystem() "
+          f"{statistics.median(columns[1]):7.2f} ms   second CANSystem() {statistics.median(columns[2]):6.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CANSystem startup time")
+    parser.add_argument("-n", "--runs", type=int, default=10)
+    args = parser.parse_args()
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    report(f"median of {args.runs} runs :", [run_child(root) for _ in range(args.runs)])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+import sys
+import threading
+import time
+import types
+
+# Fake SoloPy and RPi.GPIO modules, to run MotorController / DualMotorController
+# without the Raspberry Pi nor the SOLO controllers.
+# install() must be called before importing back_part.MotorController :
+#
+#   from test_files import fake_solo
+#   fake_solo.install(connect_delay={"/dev/ttyAMA0": 1.0}, write_delay=0.002)
+#   from back_part.DualMotorController import DualMotorController
+#
+# connect_delay : seconds after opening the UART before communication_is_working()
+#                 succeeds (float, or {uart_port: float})
+# write_delay   : duration of every write (one UART transaction), float or {uart_port: float}
+# Every write is logged in fake_solo.calls as (time.monotonic(), uart_port, method, value).
+
+calls = []
+_calls_lock = threading.Lock()
+
+
+def _per_port(value, port):
+    return value.get(port, 0.0) if isinstance(value, dict) else value
+
+
+def _enum(name, *members):
+    return type(name, (), {member: member for member in members})
+
+
+def install(connect_delay=0.0, write_delay=0.0):
+    solo = types.ModuleType("SoloPy")
+    solo.UartBaudRate = _enum("UartBaudRate", "RATE_937500", "RATE_115200")
+    solo.CommandMode = _enum("CommandMode", "DIGITAL", "ANALOGUE")
+    solo.MotorType = _enum("MotorType", "BLDC_PMSM", "DC")
+    solo.FeedbackControlMode = _enum("FeedbackControlMode", "HALL_SENSORS", "ENCODERS")
+    solo.ControlMode = _enum("ControlMode", "TORQUE_MODE", "SPEED_MODE")
+    solo.Direction = _enum("Direction", "CLOCKWISE", "COUNTERCLOCKWISE")
+    solo.Error = _enum("Error", "NO_ERROR_DETECTED")
+
+    class SoloMotorControllerUart:
+        def __init__(self, port, address, baudrate):
+            self.port = port
+            self.address = address
+            self.opened = time.monotonic()
+
+        def communication_is_working(self):
+            if time.monotonic() - self.opened >= _per_port(connect_delay, self.port):
+                return True, solo.Error.NO_ERROR_DETECTED
+            return False, "timeout"
+
+        def _write(self, method, value):
+            time.sleep(_per_port(write_delay, self.port))
+            with _calls_lock:
+                calls.append((time.monotonic(), self.port, method, value))
+            return True, solo.Error.NO_ERROR_DETECTED
+
+        def get_quadrature_current_iq_feedback(self):
+            return 0.0, solo.Error.NO_ERROR_DETECTED
+
+        def get_speed_feedback(self):
+            return 0, solo.Error.NO_ERROR_DETECTED
+
+    for method in ("set_command_mode", "set_motor_type", "set_feedback_control_mode", "set_control_mode",
+                   "set_motor_direction", "set_torque_reference_iq"):
+        setattr(SoloMotorControllerUart, method,
+                lambda self, value, method=method: self._write(method, value))
+    solo.SoloMotorControllerUart = SoloMotorControllerUart
+
+    gpio = types.ModuleType("RPi.GPIO")
+    gpio.BCM, gpio.OUT, gpio.HIGH, gpio.LOW = "BCM", "OUT", 1, 0
+    gpio.setwarnings = gpio.setmode = gpio.setup = gpio.output = lambda *args, **kwargs: None
+    rpi = types.ModuleType("RPi")
+    rpi.GPIO = gpio
+
+    sys.modules["SoloPy"] = solo
+    sys.modules["RPi"] = rpi
+    sys.modules["RPi.GPIO"] = gpio
+    calls.clear()
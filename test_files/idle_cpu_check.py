@@ -0,0 +1,75 @@
+import argparse
+import sys
+import threading
+import time
+
+from CAN_system.CANSystem import CANSystem
+
+# Execute : python3 -m test_files.idle_cpu_check
+
+# CPU used by a CANSystem on an idle bus, measured as the process CPU time
+# (time.process_time(), every thread) before and after a few seconds of idling :
+# - "polling" : the listening loop before user-001, calling can_input()
+#   without blocking in a loop (busy polling)
+# - "blocking" : start_listening(), whose thread blocks on the RX queue
+# The check fails (exit code 1) when the blocking loop uses more than
+# MAX_IDLE_CPU_MS_PER_S. Uses the "virtual" interface : no CAN hardware needed.
+
+CHANNEL = "idle_cpu_check"
+# CPU time allowed per second of idling (ms), i.e. 2 % of one core
+MAX_IDLE_CPU_MS_PER_S = 20.0
+
+
+def idle_cpu(duration):
+    # CPU ms per second of wall time while the bus stays silent
+    time.sleep(0.2)  # threads started, nothing left to initialize
+    cpu, wall = time.process_time(), time.monotonic()
+    time.sleep(duration)
+    return (time.process_time() - cpu) * 1000.0 / (time.monotonic() - wall)
+
+
+def measure_polling(duration):
+    can_system = CANSystem("OBU", channel=CHANNEL, interface="virtual")
+    stop = threading.Event()
+
+    def poll():
+        while not stop.is_set():
+            can_system.listener.can_input()
+
+    thread = threading.Thread(target=poll, name="idle-poll", daemon=True)
+    thread.start()
+    try:
+        return idle_cpu(duration)
+    finally:
+        stop.set()
+        thread.join()
+        can_system.stop()
+
+
+def measure_blocking(duration):
+    can_system = CANSystem("OBU", channel=CHANNEL, interface="virtual")
+    can_system.start_listening()
+    try:
+        return idle_cpu(duration)
+    finally:
+        can_system.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CPU used by CANSystem on an idle bus")
+    parser.add_argument("-d", "--duration", type=float, default=3.0, help="Idle time measured (s)")
+    args = parser.parse_args()
+
+    polling = measure_polling(args.duration)
+    blocking = measure_blocking(args.duration)
+    print(f"polling  {polling:7.1f} ms CPU per s idle")
+    print(f"blocking {blocking:7.1f} ms CPU per s idle")
+
+    if blocking > MAX_IDLE_CPU_MS_PER_S:
+        print(f"FAIL : more than {MAX_IDLE_CPU_MS_PER_S} ms CPU per s on an idle bus")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
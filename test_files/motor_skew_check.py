@@ -0,0 +1,72 @@
+import argparse
+import time
+
+from CAN_system.CANLatency import percentile
+from test_files import fake_solo
+
+# Execute : python3 -m test_files.motor_skew_check --write 0.002
+
+# Left/right skew of the torque commands with a fake SoloPy backend (fake_solo.py).
+# Each command is written on both UARTs ; the skew is the time between the two
+# writes. Compares writing m1 then m2 (the former DualMotorController) with the
+# parallel workers of DualMotorController, and prints skew_stats().
+# Then sends a burst of setpoints faster than the UART : set_torque() does not
+# block, only the latest setpoint is written (torque_stats()).
+
+
+def skews(calls, method):
+    # Pairs of writes of the same method, one per UART, in order
+    writes = [t for t, _, name, _ in calls if name == method]
+    return sorted(abs(b - a) for a, b in zip(writes[0::2], writes[1::2]))
+
+
+def show(label, values):
+    print(f"{label:<12} p50={percentile(values, 0.50) * 1000:.3f} p99={percentile(values, 0.99) * 1000:.3f} "
+          f"max={values[-1] * 1000:.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Left/right torque skew with a fake SOLO backend")
+    parser.add_argument("--write", type=float, default=0.002, help="Duration of one UART write (s)")
+    parser.add_argument("-n", "--commands", type=int, default=200)
+    args = parser.parse_args()
+
+    fake_solo.install(write_delay=args.write)
+    from back_part.DualMotorController import DualMotorController
+
+    motors = DualMotorController()
+    motors.configure()
+
+    fake_solo.calls.clear()
+    for i in range(args.commands):
+        motors.m1.set_torque(i % 10)
+        motors.m2.set_torque(i % 10)
+    show("sequential", skews(fake_solo.calls, "set_torque_reference_iq"))
+
+    fake_solo.calls.clear()
+    start = time.monotonic()
+    for i in range(args.commands):
+        motors.set_torque(i % 10)
+        motors.flush()
+    elapsed = time.monotonic() - start
+    show("parallel", skews(fake_solo.calls, "set_torque_reference_iq"))
+    print(f"{elapsed / args.commands * 1000:.3f} ms per command, skew_stats = {motors.skew_stats()}")
+
+    # Burst : pedal frames arriving faster than the UART writes
+    start = time.monotonic()
+    for i in range(args.commands):
+        motors.set_torque(i * 0.1)
+    blocked = time.monotonic() - start
+    motors.flush()
+    print(f"burst : {args.commands} set_torque() in {blocked * 1000:.1f} ms, torque_stats = {motors.torque_stats()}")
+
+    # Noisy pedal : changes smaller than the deadband are not written
+    for i in range(args.commands):
+        motors.set_torque(5.0 + (i % 3) * 0.01)
+        motors.flush()
+    print(f"noisy : torque_stats = {motors.torque_stats()}")
+    motors.stop()
+
+
+if __name__ == "__main__":
+    main()
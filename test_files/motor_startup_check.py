@@ -0,0 +1,40 @@
+import argparse
+import math
+import time
+
+from test_files import fake_solo
+
+# Execute : python3 -m test_files.motor_startup_check --m1-connect 2 --m2-connect 3
+
+# Startup time of DualMotorController with a fake SoloPy backend (fake_solo.py) :
+# both SOLO are connected and configured in parallel, so the startup should take
+# about max(m1, m2) and not m1 + m2. Prints the duration of each phase.
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DualMotorController startup with a fake SOLO backend")
+    parser.add_argument("--m1-connect", type=float, default=2.0, help="Connection delay of m1 (s)")
+    parser.add_argument("--m2-connect", type=float, default=3.0, help="Connection delay of m2 (s)")
+    parser.add_argument("--write", type=float, default=0.1, help="Duration of one UART write (s)")
+    parser.add_argument("-v", "--verbose", action="store_true")
+    args = parser.parse_args()
+
+    fake_solo.install(connect_delay={"/dev/ttyAMA0": args.m1_connect, "/dev/ttyAMA3": args.m2_connect},
+                      write_delay=args.write)
+    from back_part.DualMotorController import DualMotorController
+    from back_part.MotorController import CONNECT_POLL
+
+    start = time.monotonic()
+    motors = DualMotorController(verbose=args.verbose)
+    motors.configure()
+    elapsed = time.monotonic() - start
+
+    print(motors.startup_report())
+    # configure() = 4 writes ; connection detected at the next poll
+    poll = lambda delay: max(1, math.ceil(delay / CONNECT_POLL)) * CONNECT_POLL
+    m1, m2 = poll(args.m1_connect) + 4 * args.write, poll(args.m2_connect) + 4 * args.write
+    print(f"total {elapsed:.2f} s (sequential would be ~{m1 + m2:.2f} s, parallel ~{max(m1, m2):.2f} s)")
+
+
+if __name__ == "__main__":
+    main()
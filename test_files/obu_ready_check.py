@@ -0,0 +1,61 @@
+import argparse
+import functools
+import sys
+import time
+
+from test_files import fake_solo
+
+# Execute : python3 -m test_files.obu_ready_check
+
+# The BRAKE and STEER nodes send their ready frame as soon as the OBU listens,
+# before the mode machine has entered INITIALIZE. The OBU acks them, so the
+# nodes never send them again : the OBU must still reach MANUAL.
+# Runs on a virtual CAN bus with a fake SoloPy backend (fake_solo.py).
+# The check fails (exit code 1) when the OBU stays in INITIALIZE.
+
+CHANNEL = "obu_ready_check"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OBU startup with ready frames sent before INITIALIZE")
+    parser.add_argument("--timeout", type=float, default=5.0, help="Max time to reach MANUAL (s)")
+    parser.add_argument("-v", "--verbose", action="store_true")
+    args = parser.parse_args()
+
+    fake_solo.install(connect_delay=0.2, write_delay=0.001)
+    import back_part.OBU as obu_module
+    from CAN_system.CANSystem import CANSystem
+
+    bus = functools.partial(CANSystem, channel=CHANNEL, interface="virtual", shared_bus=True, tx_scheduler=True)
+    nodes = [bus("BRAKE"), bus("STEER")]
+    for node in nodes:
+        node.start_listening()
+
+    class EarlyReadyCANSystem(CANSystem):
+        # The ready handshakes are done inside start_listening(), i.e. before
+        # OBU.__init__() starts the mode machine and posts "init"
+        def start_listening(self):
+            super().start_listening()
+            for node, order in zip(nodes, ("brake_rdy", "steer_rdy")):
+                node.request("OBU", order, 1, ack_order="ready_ack", timeout=1.0).result()
+
+    obu_module.CANSystem = functools.partial(EarlyReadyCANSystem, channel=CHANNEL, interface="virtual")
+    obu = obu_module.OBU(verbose=args.verbose)
+
+    start = time.monotonic()
+    while obu.mode != "MANUAL" and time.monotonic() - start < args.timeout:
+        time.sleep(0.01)
+    mode = obu.mode
+    print(f"mode {mode} after {time.monotonic() - start:.2f} s")
+
+    obu.shutdown()
+    for node in nodes:
+        node.stop()
+    if mode != "MANUAL":
+        print("FAIL : ready frames received before INITIALIZE were lost")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
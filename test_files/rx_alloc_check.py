@@ -0,0 +1,102 @@
+import argparse
+import sys
+import tracemalloc
+
+import can
+
+from CAN_system.CANSystem import CANManager, CANReceiver
+
+# Execute : python3 -m test_files.rx_alloc_check
+
+# Allocations of the CANReceiver path (on_message_received -> queue/mailbox
+# -> can_input), counted with tracemalloc snapshots :
+# - live blocks / bytes per queued frame, taken after a batch is queued and
+#   before it is drained. The can.Message objects are built before the
+#   snapshot : only the receive path is counted.
+# - blocks still allocated once every batch is drained, which must not grow
+#   with the number of frames.
+# With the frame pool, a queued frame costs only its queue entry. The check
+# fails (exit code 1) when the pooled path goes over the bounds below.
+# No CAN interface is needed.
+
+ORDERS = ["brake_pos_real", "bouton_park", "steer_pos_real", "brake_enable"]
+# Bounds of the pooled path
+MAX_BLOCKS_PER_QUEUED_FRAME = 1.0
+MAX_RETAINED_BLOCKS = 32
+# tracemalloc's own allocations are not part of the measure
+FILTERS = [tracemalloc.Filter(False, tracemalloc.__file__)]
+
+
+def snapshot():
+    return tracemalloc.take_snapshot().filter_traces(FILTERS)
+
+
+def diff(after, before):
+    stats = after.compare_to(before, "filename")
+    return sum(stat.count_diff for stat in stats), sum(stat.size_diff for stat in stats)
+
+
+def frames(manager, ids, count, base):
+    return [can.Message(arbitration_id=ids[i % len(ids)], data=manager.encode_data(base + i), is_extended_id=False)
+            for i in range(count)]
+
+
+def drain(receiver):
+    while receiver.can_input() is not None or receiver.msg_queue.qsize():
+        pass
+
+
+def measure(batches, batch, pooled):
+    manager = CANManager(bus=None, device_name="OBU")
+    receiver = CANReceiver(manager, queue_policy="edf")
+    if not pooled:
+        # Same path, but every frame gets a new record as before the pool
+        receiver.frame_pool.size = 0
+        receiver.frame_pool._free.clear()
+    ids = [manager.encode("OBU", order) for order in ORDERS]
+    for i in range(4):  # warm-up : dict entries, stats, ...
+        for msg in frames(manager, ids, batch, i * batch):
+            receiver.on_message_received(msg)
+        drain(receiver)
+
+    tracemalloc.start()
+    start = snapshot()
+    queued_blocks = queued_bytes = 0.0
+    for i in range(batches):
+        msgs = frames(manager, ids, batch, 300 + i * batch)
+        before = snapshot()
+        for msg in msgs:
+            receiver.on_message_received(msg)
+        blocks, size = diff(snapshot(), before)
+        queued_blocks = max(queued_blocks, blocks / batch)
+        queued_bytes = max(queued_bytes, size / batch)
+        del msgs
+        drain(receiver)
+    retained, _ = diff(snapshot(), start)
+    tracemalloc.stop()
+    return queued_blocks, queued_bytes, retained, receiver.frame_pool.misses
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Allocations per frame on the CAN receive path")
+    parser.add_argument("--batches", type=int, default=40)
+    parser.add_argument("-b", "--batch", type=int, default=64, help="Frames queued before draining")
+    args = parser.parse_args()
+
+    results = {}
+    for label, pooled in (("without pool", False), ("frame pool", True)):
+        results[pooled] = measure(args.batches, args.batch, pooled)
+        blocks, size, retained, misses = results[pooled]
+        print(f"{label:<13} {blocks:5.2f} blocks {size:7.1f} B per queued frame  "
+              f"retained {retained} blocks after {args.batches * args.batch} frames  pool misses {misses}")
+
+    blocks, _, retained, misses = results[True]
+    if blocks > MAX_BLOCKS_PER_QUEUED_FRAME or retained > MAX_RETAINED_BLOCKS or misses:
+        print(f"FAIL : more than {MAX_BLOCKS_PER_QUEUED_FRAME} block per queued frame, "
+              f"{MAX_RETAINED_BLOCKS} retained blocks or pool misses")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
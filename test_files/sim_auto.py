@@ -24,6 +24,7 @@ def main(stdscr):
     can.start_listening()
 
     accel = 0
+    alive = 0  # 'alive' counter of accel_pedal, see the OBU pedal watchdog
     steer = 512
 
     stdscr.addstr(0, 0, "[CAN Keyboard Driver Started]", curses.A_BOLD)
@@ -44,13 +45,16 @@ def main(stdscr):
             key = stdscr.getch()
             stdscr.clrtoeol()
 
+            # Sent on every loop (100 ms) with a new counter : the OBU cuts the
+            # torque when accel_pedal stops changing for PEDAL_TIMEOUT
+            alive = (alive + 1) & 0xF
+            can.can_send("OBU", "accel_pedal", {"value": accel, "alive": alive})
+
             if key == ord('w'):
                 accel = min(1023, accel + 50)
-                can.can_send("OBU", "accel_pedal", accel)
                 stdscr.addstr(14, 0, f"Acceleration sent: {accel}     ")
             elif key == ord('s'):
                 accel = max(0, accel - 50)
-                can.can_send("OBU", "accel_pedal", accel)
                 stdscr.addstr(14, 0, f"Deceleration sent: {accel}     ")
             elif key == ord('a'):
                 steer = max(0, steer - 100)